@@ -1,34 +1,179 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import (
+    Blueprint as FlaskBlueprint, Flask, Response, current_app, flash, jsonify, redirect, render_template, request,
+    stream_with_context, url_for,
+)
+from flask.views import MethodView
+import click
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_smorest import Api, Blueprint, abort
-from flask_restful import Resource
-from datetime import datetime, timedelta
-from marshmallow import Schema, fields, ValidationError
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tasks.db'
-app.config['SECRET_KEY'] = 'your_secret_key_here'
-app.config['API_TITLE'] = 'Flask Task Manager API'
-app.config['API_VERSION'] = 'v1'
-app.config['OPENAPI_VERSION'] = '3.0.2'
-app.config['OPENAPI_URL_PREFIX'] = '/'
-app.config['OPENAPI_SWAGGER_UI_PATH'] = '/swagger-ui'
-app.config['OPENAPI_SWAGGER_UI_URL'] = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist/'
-
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-api = Api(app)
+from datetime import date, datetime, timedelta
+from marshmallow import fields, validate, ValidationError
+from sqlalchemy import and_, case, delete, event, func, insert, literal, or_, select, text, union_all, update
+from sqlalchemy.orm import object_session, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from webargs.fields import DelimitedList
+from urllib.parse import urlencode
+from contextlib import contextmanager
+from array import array
+import base64
+import binascii
+import csv
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from assets import StaticAssets, precompress
+from cache import FragmentCache, LRUCache, ResponseCache
+from compression import Compress
+from events import EventBroker, Overflow, format_event
+from metrics import Metrics, TimedSchema
+from replicas import ReplicaRouter, RoutingSession, copy_sqlite_database
+from graph import CycleError, DependencyGraph
+from jobs import JobError, JobQueue
+from serialization import as_dicts, dumps, json_response
+from search import (
+    create_statements, include_object, match_expression, rebuild_statements, search_statement, search_terms,
+)
+
+def database_url(url=None):
+    """url, else $DATABASE_URL, defaulting to the local SQLite file"""
+    url = url or os.environ.get('DATABASE_URL', 'sqlite:///tasks.db')
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def replica_binds():
+    """Binds for the read replicas listed, comma-separated, in $DATABASE_REPLICA_URLS"""
+    urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    return {
+        f'replica_{number}': {'url': database_url(url), **engine_options(url)}
+        for number, url in enumerate(urls, 1)
+    }
+
+def engine_options(url):
+    """Connection pool settings, tunable through environment variables"""
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if not url.startswith('sqlite'):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    return options
+
+class Config:
+    """Defaults for create_app(); the page and batch limits are also used by the request schemas"""
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key_here')
+    API_TITLE = 'Flask Task Manager API'
+    API_VERSION = 'v1'
+    OPENAPI_VERSION = '3.0.2'
+    OPENAPI_URL_PREFIX = '/'
+    OPENAPI_SWAGGER_UI_PATH = '/swagger-ui'
+    OPENAPI_SWAGGER_UI_URL = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist/'
+    API_PAGE_SIZE = 100  # Default page size once a client paginates
+    API_MAX_PAGE_SIZE = 1000
+    API_MAX_BATCH_SIZE = 1000
+    API_REQUIRE_IF_MATCH = True  # PUT and DELETE must send the ETag they are based on
+    API_STREAM_CHUNK_SIZE = 1000  # Rows fetched or inserted at a time by /export and /import
+    API_ASYNC_THRESHOLD = 1000  # Rows above which a delete or template application runs as a job
+    API_ASYNC_IMPORT_BYTES = 1024 * 1024  # Larger imports run as a job
+    API_FAST_JSON = True  # Build list and task responses from rows instead of marshmallow dumps
+    TASK_ARCHIVE_AFTER_DAYS = 30  # Tasks done for longer are archived by `flask archive-tasks`
+    TASK_ARCHIVE_CHUNK_SIZE = 1000  # Tasks archived per committed transaction
+    SLOW_REQUEST_THRESHOLD_MS = os.environ.get('SLOW_REQUEST_THRESHOLD_MS')  # Unset disables the slow-request log
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')  # Unset keeps the cache in process memory
+    EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL')  # Unset keeps the event broker in process memory
+
+# SQLite runs with a write-ahead log so readers don't block the writer,
+# and waits for locks instead of failing with "database is locked".
+# create_app() registers the listener on each of the app's engines.
+def sqlite_pragmas(busy_timeout):
+    """Engine connect listener tuning new SQLite connections; busy_timeout is in milliseconds"""
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+    return set_sqlite_pragmas
+
+class LazyDocsApi(Api):
+    """Api that builds the OpenAPI spec the first time it is read.
+
+    Documenting the views walks every schema they use, which is most of
+    the app's startup time, while only /openapi.json and the Swagger UI
+    need the result. Blueprints are routed as soon as they are
+    registered; their documentation is added to the spec on first use.
+    """
+
+    def _init_spec(self, **spec_kwargs):
+        self._spec = None
+        self._spec_kwargs_pending = spec_kwargs
+        self._undocumented = []
+        self._spec_lock = threading.Lock()
+
+    @property
+    def spec(self):
+        if self._spec is None:
+            with self._spec_lock:
+                if self._spec is None:
+                    super()._init_spec(**self._spec_kwargs_pending)
+                    for blp, name, parameters in self._undocumented:
+                        blp.register_views_in_doc(self, self._app, self._spec, name=name, parameters=parameters)
+                        self._spec.tag({'name': name, 'description': blp.description})
+        return self._spec
+
+    @spec.setter
+    def spec(self, spec):
+        self._spec = spec
+
+    def register_blueprint(self, blp, *, parameters=None, **options):
+        name = options.get('name', blp.name)
+        self._app.extensions['flask-smorest']['blp_name_to_api'][name] = self
+        self._app.register_blueprint(blp, **options)
+        self._undocumented.append((blp, name, parameters))
+
+# Extensions, bound to the application by create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+replica_router = ReplicaRouter(db)
+migrate = Migrate(include_object=include_object)
+api = LazyDocsApi()
+response_cache = ResponseCache()
+fragment_cache = FragmentCache()
+response_compression = Compress()
+static_assets = StaticAssets()
+metrics = Metrics()
+job_queue = JobQueue()
+event_broker = EventBroker()
+# Responses read from a replica may lag behind the primary, so they expire
+# sooner, and are cached apart from those read from the primary: clients
+# that just wrote read the primary and must not get a replica's older copy.
+# Views put read_only above cached, so the database is chosen first.
+response_cache.entry_ttl = replica_router.cache_ttl
+response_cache.key_variant = replica_router.current
 
 # Database Models
 class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(200))
+    # Optimistic concurrency: every UPDATE checks and bumps the version
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     tasks = db.relationship('Task', backref='project', lazy=True, cascade='all, delete-orphan')
 
+    __mapper_args__ = {'version_id_col': version}
+
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -36,6 +181,12 @@ class Task(db.Model):
     status = db.Column(db.String(50), default='To Do')
     due_date = db.Column(db.Date, default=lambda: (datetime.utcnow() + timedelta(days=2)).date())
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    # Number of dependencies not yet 'Done', kept up to date by refresh_open_dependency_counts
+    open_dependency_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Optimistic concurrency: every UPDATE checks and bumps the version
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # When the status last became 'Done'; old completed tasks get archived
+    completed_at = db.Column(db.DateTime)
     dependencies = db.relationship(
         'Task',  # Self-referential relationship
         secondary='task_dependencies',  # Association table
@@ -44,6 +195,16 @@ class Task(db.Model):
         backref='dependents'
     )
 
+    __table_args__ = (
+        db.Index('ix_task_project_ready', 'project_id', 'open_dependency_count', 'status'),
+        db.Index('ix_task_project_status_due', 'project_id', 'status', 'due_date'),
+        db.Index('ix_task_project_due', 'project_id', 'due_date'),
+        db.Index('ix_task_status_completed', 'status', 'completed_at'),
+        # Ids are never reused, so an archived task's id can't come back
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version}
+
 class TaskTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -57,39 +218,1184 @@ class TemplateTask(db.Model):
     status = db.Column(db.String(50), default='To Do')
     due_date_offset = db.Column(db.Integer, default=0)  # Days offset from the project start date
     template_id = db.Column(db.Integer, db.ForeignKey('task_template.id'), nullable=False)
+    dependencies = db.relationship(
+        'TemplateTask',
+        secondary='template_task_dependencies',
+        primaryjoin='TemplateTask.id == template_task_dependencies.c.template_task_id',
+        secondaryjoin='TemplateTask.id == template_task_dependencies.c.dependency_id',
+        backref='dependents'
+    )
 
 # Association table for task dependencies
 task_dependencies = db.Table(
     'task_dependencies',
     db.Column('task_id', db.Integer, db.ForeignKey('task.id'), primary_key=True),
-    db.Column('dependency_id', db.Integer, db.ForeignKey('task.id'), primary_key=True)
+    db.Column('dependency_id', db.Integer, db.ForeignKey('task.id'), primary_key=True),
+    db.Index('ix_task_dependencies_dependency_id', 'dependency_id')
+)
+
+# Archive of completed tasks
+# Tasks done for longer than TASK_ARCHIVE_AFTER_DAYS are moved here with
+# their ids and dependency edges, so the task table only holds the
+# working set. A task is only archived together with every task that
+# depends on it: live tasks never depend on archived ones.
+class ArchivedTask(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The id the task had
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(200))
+    status = db.Column(db.String(50))
+    due_date = db.Column(db.Date)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    completed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_archived_task_project_id', 'project_id', 'id'),
+    )
+
+# Dependencies of archived tasks; the dependency may be live or archived
+archived_task_dependencies = db.Table(
+    'archived_task_dependencies',
+    db.Column('task_id', db.Integer, db.ForeignKey('archived_task.id'), primary_key=True),
+    db.Column('dependency_id', db.Integer, primary_key=True),
+    db.Index('ix_archived_task_dependencies_dependency_id', 'dependency_id')
 )
 
+@event.listens_for(Task.status, 'set', active_history=True)
+def stamp_completion(target, value, oldvalue, initiator):
+    # Bulk writes bypass this; those that leave done tasks without a time
+    # are caught up by stamp_unknown_completions before archiving
+    if value == 'Done':
+        if oldvalue != 'Done':
+            target.completed_at = datetime.utcnow()
+    elif target.completed_at is not None:
+        target.completed_at = None
+
+# The full-text index is maintained by the database (see search.py)
+@event.listens_for(Project.__table__, 'after_create')
+@event.listens_for(Task.__table__, 'after_create')
+def create_search_index(target, connection, **kw):
+    for statement in create_statements(connection.dialect.name, target.name):
+        connection.exec_driver_sql(statement)
+
+# Association table for dependencies between the tasks of a template
+template_task_dependencies = db.Table(
+    'template_task_dependencies',
+    db.Column('template_task_id', db.Integer, db.ForeignKey('template_task.id'), primary_key=True),
+    db.Column('dependency_id', db.Integer, db.ForeignKey('template_task.id'), primary_key=True)
+)
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class TaskEvent(db.Model):
+    """Change log of task writes, replayed by the project event streams"""
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False)  # No foreign key: the log outlives deleted projects
+    task_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(20), nullable=False)  # created, updated, completed, archived, deleted
+    data = db.Column(db.Text, nullable=False)  # The task as JSON, as the API returns it
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_task_event_project_id', 'project_id', 'id'),
+    )
+
+# Cache invalidation
+# Namespaces are collected on the session and invalidated only once the
+# transaction commits, so a concurrent reader can't cache pre-commit data
+# under the new generation. The rendered fragments of the HTML pages are
+# named after the same namespaces.
+def invalidate_on_commit(*namespaces):
+    db.session.info.setdefault('stale_namespaces', set()).update(namespaces)
+
+def invalidate_tasks(task_ids=(), project_ids=()):
+    """Drop cached task responses and the task lists of the given projects"""
+    invalidate_on_commit(
+        *(f'task:{task_id}' for task_id in task_ids),
+        *(f'project:{project_id}:tasks' for project_id in project_ids)
+    )
+
+def invalidate_projects(project_ids=(), deleted=False):
+    """Drop cached project responses and the project list"""
+    invalidate_on_commit('projects', *(f'project:{project_id}' for project_id in project_ids))
+    if deleted:
+        invalidate_tasks(project_ids=project_ids)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_committed_namespaces(session):
+    names = session.info.pop('stale_namespaces', ())
+    response_cache.invalidate(names)
+    fragment_cache.invalidate(names)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_stale_namespaces(session):
+    session.info.pop('stale_namespaces', None)
+
+# Background jobs
+# A job row is written in the transaction that requests it and handed to
+# the worker pool once that transaction commits.
+def enqueue_job(name, **payload):
+    """Store a job for the handler registered as name; it runs after commit"""
+    job = Job(name=name, payload=payload)
+    db.session.add(job)
+    db.session.flush()
+    db.session.info.setdefault('queued_jobs', []).append(job.id)
+    return job
+
+@event.listens_for(db.session, 'after_commit')
+def submit_queued_jobs(session):
+    for job_id in session.info.pop('queued_jobs', ()):
+        job_queue.submit(job_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_queued_jobs(session):
+    session.info.pop('queued_jobs', None)
+
+class JobStore:
+    """Keeps the job table up to date for the job queue; every call commits"""
+
+    def start(self, job_id):
+        job = db.session.get(Job, job_id)
+        if job is None or job.status not in ('queued', 'running'):
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        return job.name, job.payload, job.attempts
+
+    def finish(self, job_id, result):
+        job = db.session.get(Job, job_id)
+        job.status = 'succeeded'
+        job.result = result
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def fail(self, job_id, error, retry):
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.status = 'queued' if retry else 'failed'
+        job.error = error
+        if not retry:
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+job_queue.store = JobStore()
+
+# Change feed
+# Write handlers note the tasks they create, change or delete. The notes
+# become rows of the task_event log just before the transaction commits,
+# so they capture each task's final state, and are published to the
+# project's event streams once it has committed.
+EVENT_PRECEDENCE = {'updated': 0, 'completed': 1, 'created': 2, 'archived': 3, 'deleted': 4}
+# Events of tasks that leave the task table
+REMOVAL_EVENTS = ('archived', 'deleted')
+# PostgreSQL advisory lock held by transactions writing events
+TASK_EVENT_LOCK = 0x7461736b
+
+def record_task_events(kind, task_ids, project_ids=None):
+    """Note that tasks were created, updated, completed, archived or deleted.
+
+    A task noted several times in a transaction gets a single event, the
+    most significant one. Archived and deleted tasks are gone by commit
+    time, so ``project_ids`` must map each of them to its project.
+    """
+    noted = db.session.info.setdefault('task_events', {})
+    for task_id in task_ids:
+        previous = noted.get(task_id)
+        if previous is None or EVENT_PRECEDENCE[kind] >= EVENT_PRECEDENCE[previous[0]]:
+            noted[task_id] = (kind, project_ids[task_id] if project_ids else None)
+
+def update_event(old_status, new_status):
+    """The event for an updated task: ``completed`` when it has just become done"""
+    return 'completed' if new_status == 'Done' and old_status != 'Done' else 'updated'
+
+def task_snapshots(task_ids):
+    """The API representation of each task, keyed by id"""
+    task_ids = list(task_ids)
+    chunk_size = current_app.config['API_STREAM_CHUNK_SIZE']
+    snapshots = {}
+    for start in range(0, len(task_ids), chunk_size):
+        rows = db.session.query(*field_columns(TASK_FIELDS)).filter(
+            Task.id.in_(task_ids[start:start + chunk_size])
+        ).all()
+        snapshots.update((item['id'], item) for item in attach_dependency_ids(rows))
+    return snapshots
+
+@event.listens_for(db.session, 'before_commit')
+def write_task_events(session):
+    noted = session.info.pop('task_events', None)
+    if not noted:
+        return
+    snapshots = task_snapshots(task_id for task_id, (kind, _) in noted.items() if kind not in REMOVAL_EVENTS)
+    rows = []
+    for task_id, (kind, project_id) in noted.items():
+        if kind in REMOVAL_EVENTS:
+            data = {'id': task_id, 'project_id': project_id}
+        elif task_id in snapshots:
+            data = snapshots[task_id]
+        else:
+            continue
+        rows.append({'project_id': data['project_id'], 'task_id': task_id, 'type': kind, 'data': dumps(data).decode()})
+    if rows:
+        # Streams read the log past the last id they sent, so ids must
+        # become visible in the order they are handed out. SQLite runs
+        # one write transaction at a time; on PostgreSQL, event writers
+        # take turns from here to their commit. Pending changes are
+        # flushed first, so no row lock is awaited while holding the turn.
+        session.flush()
+        if session.get_bind().dialect.name == 'postgresql':
+            session.execute(select(func.pg_advisory_xact_lock(TASK_EVENT_LOCK)))
+        # Every task has one event per transaction, so ids are matched by
+        # task id and the insert needn't keep its rows in order
+        event_ids = dict(session.execute(insert(TaskEvent).returning(TaskEvent.task_id, TaskEvent.id), rows).all())
+        session.info.setdefault('written_task_events', []).extend(
+            dict(row, id=event_ids[row['task_id']]) for row in sorted(rows, key=lambda row: event_ids[row['task_id']])
+        )
+
+@event.listens_for(db.session, 'after_commit')
+def publish_task_events(session):
+    for row in session.info.pop('written_task_events', ()):
+        event_broker.publish(f"project:{row['project_id']}", row)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_task_events(session):
+    session.info.pop('task_events', None)
+    session.info.pop('written_task_events', None)
+
+@event.listens_for(TaskTemplate, 'after_update')
+@event.listens_for(TaskTemplate, 'after_delete')
+@event.listens_for(TemplateTask, 'after_insert')
+@event.listens_for(TemplateTask, 'after_update')
+@event.listens_for(TemplateTask, 'after_delete')
+def invalidate_template(mapper, connection, target):
+    # Template edits invalidate the cached plan; the generation stamps are
+    # shared, so every worker reloads it.
+    template_id = target.id if isinstance(target, TaskTemplate) else target.template_id
+    object_session(target).info.setdefault('stale_namespaces', set()).add(f'template:{template_id}')
+
+# Template application
+# A template is loaded once into a plan of plain tuples, cached per
+# template and generation, and applied to any number of projects with a
+# single multi-row INSERT.
+template_plans = LRUCache(maxsize=256, ttl=None)
+
+def load_template_plan(template_id):
+    """Return ``(tasks, edges)`` for a template, or None if it doesn't exist.
+
+    ``tasks`` holds ``(template_task_id, title, description, status,
+    due_date_offset)`` tuples and ``edges`` ``(template_task_id,
+    dependency_id)`` pairs between them.
+    """
+    stamp, = response_cache.backend.generations([f'template:{template_id}'])
+    plan = template_plans.get((template_id, stamp))
+    if plan is None:
+        if db.session.get(TaskTemplate, template_id) is None:
+            return None
+        tasks = tuple(db.session.execute(
+            select(TemplateTask.id, TemplateTask.title, TemplateTask.description,
+                   TemplateTask.status, TemplateTask.due_date_offset)
+            .where(TemplateTask.template_id == template_id)
+            .order_by(TemplateTask.id)
+        ).all())
+        template_task_ids = select(TemplateTask.id).where(TemplateTask.template_id == template_id)
+        edges = tuple(db.session.execute(
+            select(template_task_dependencies.c.template_task_id, template_task_dependencies.c.dependency_id)
+            .where(template_task_dependencies.c.template_task_id.in_(template_task_ids))
+        ).all())
+        plan = (tasks, edges)
+        template_plans.set((template_id, stamp), plan)
+    return plan
+
+def apply_template_plan(plan, project_ids, start_date=None):
+    """Create a template's tasks and dependencies in every project.
+
+    Due dates are offsets from ``start_date`` (today by default). Returns
+    a dict mapping each project id to the ids of its new tasks.
+    """
+    template_tasks, template_edges = plan
+    base_date = start_date or datetime.utcnow().date()
+    project_ids = list(project_ids)
+    created = {project_id: [] for project_id in project_ids}
+    if not template_tasks:
+        return created
+
+    rows = [{
+        'title': title,
+        'description': description,
+        'status': status or 'To Do',
+        'due_date': base_date + timedelta(days=offset or 0),
+        'project_id': project_id,
+    } for project_id in project_ids for _, title, description, status, offset in template_tasks]
+    new_ids = db.session.scalars(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+    ).all()
+
+    edges = []
+    count = len(template_tasks)
+    for position, project_id in enumerate(project_ids):
+        ids = new_ids[position * count:(position + 1) * count]
+        created[project_id] = ids
+        task_ids = {template_task[0]: task_id for template_task, task_id in zip(template_tasks, ids)}
+        edges.extend((task_ids[source], task_ids[target]) for source, target in template_edges)
+    insert_dependency_edges(edges)
+    refresh_open_dependency_counts(task_ids={task_id for task_id, _ in edges})
+    record_task_events('created', new_ids)
+    invalidate_tasks(project_ids=project_ids)
+    return created
+
+def is_large_application(plan, project_ids):
+    """Whether applying plan to project_ids creates enough tasks to run as a job"""
+    return len(plan[0]) * len(project_ids) > current_app.config['API_ASYNC_THRESHOLD']
+
+@job_queue.handler('apply_template')
+def apply_template_job(template_id, project_ids, start_date=None):
+    plan = load_template_plan(template_id)
+    if plan is None:
+        raise JobError('Template not found.')
+    # Projects deleted since the job was queued are skipped
+    project_ids = db.session.scalars(select(Project.id).where(Project.id.in_(project_ids))).all()
+    created = apply_template_plan(plan, project_ids, date.fromisoformat(start_date) if start_date else None)
+    db.session.commit()
+    return {'created': {str(project_id): ids for project_id, ids in created.items()}}
+
+# Query helpers
+# Each page loads its whole object graph up front so that walking
+# relationships in the templates never issues a query per row.
+# Project summaries
+# Rolled up with one GROUP BY over the (project_id, status, due_date)
+# index, plus one counting archived tasks, and cached per project. The
+# key includes the generation of the project's task list, which every
+# task write moves forward, today's date, which overdue counts depend
+# on, and the replica read from, if any. Entries also expire after
+# RESPONSE_CACHE_TTL: with the in-memory cache backend the generations
+# belong to one worker process, which doesn't see the writes made by the
+# others.
+project_summary_cache = LRUCache(maxsize=4096, ttl=None)
+
+def project_summaries(project_ids):
+    """Return ``{project_id: summary}`` with task counts per status, overdue
+    count, next due date and percent complete"""
+    project_ids = list(project_ids)
+    today = date.today()
+    stamps = response_cache.backend.generations([f'project:{project_id}:tasks' for project_id in project_ids])
+    bind = replica_router.current()
+    keys = {project_id: (project_id, stamp, today, bind) for project_id, stamp in zip(project_ids, stamps)}
+    summaries = {}
+    missing = []
+    for project_id in project_ids:
+        summary = project_summary_cache.get(keys[project_id])
+        if summary is None:
+            missing.append(project_id)
+        else:
+            summaries[project_id] = summary
+
+    if missing:
+        computed = {project_id: {
+            'total': 0, 'by_status': {}, 'overdue': 0, 'next_due_date': None, 'percent_complete': 0.0,
+        } for project_id in missing}
+        status = func.coalesce(Task.status, 'To Do')
+        rows = db.session.execute(
+            select(
+                Task.project_id, status, func.count(),
+                func.sum(case((Task.due_date < today, 1), else_=0)),
+                func.min(case((Task.due_date >= today, Task.due_date))),
+            )
+            .where(Task.project_id.in_(missing))
+            .group_by(Task.project_id, status)
+        )
+        for project_id, task_status, count, overdue, next_due in rows:
+            summary = computed[project_id]
+            summary['total'] += count
+            summary['by_status'][task_status] = count
+            if task_status != 'Done':
+                summary['overdue'] += overdue or 0
+                if next_due is not None and (summary['next_due_date'] is None or next_due < summary['next_due_date']):
+                    summary['next_due_date'] = next_due
+        # Archived tasks are all done; they still count towards the project
+        archived = db.session.execute(
+            select(ArchivedTask.project_id, func.count())
+            .where(ArchivedTask.project_id.in_(missing))
+            .group_by(ArchivedTask.project_id)
+        )
+        for project_id, count in archived:
+            summary = computed[project_id]
+            summary['total'] += count
+            summary['by_status']['Done'] = summary['by_status'].get('Done', 0) + count
+        for project_id, summary in computed.items():
+            if summary['total']:
+                done = summary['by_status'].get('Done', 0)
+                summary['percent_complete'] = round(100 * done / summary['total'], 1)
+            project_summary_cache.set(
+                keys[project_id], summary, replica_router.cache_ttl() or current_app.config['RESPONSE_CACHE_TTL']
+            )
+        summaries.update(computed)
+    return summaries
+
+def attach_summaries(rows):
+    """Give every project (model instance or projected row) its summary"""
+    summaries = project_summaries(row.id for row in rows)
+    items = []
+    for row in rows:
+        if isinstance(row, Project):
+            row.summary = summaries[row.id]
+            items.append(row)
+        else:
+            items.append({**row._asdict(), 'summary': summaries[row.id]})
+    return items
+
+def load_project_with_task_graph(project_id, criteria=(), order_by=()):
+    """Return a project and its matching tasks with their dependencies preloaded.
+
+    Takes 2 statements plus one per 500 tasks, the most ids selectinload
+    sends in one IN.
+    """
+    project = Project.query.get_or_404(project_id)
+    tasks = Task.query.options(selectinload(Task.dependencies)).filter(
+        Task.project_id == project_id, *criteria
+    ).order_by(*(order_by or [Task.id])).all()
+    return project, tasks
+
+# Task filtering and sorting, shared by the HTML views and the API
+TASK_SORTS = {
+    'id': (None, False),
+    '-id': (None, True),
+    'due_date': (Task.due_date, False),
+    '-due_date': (Task.due_date, True),
+}
+
+def task_filter_criteria(statuses=None, due_after=None, due_before=None, model=Task):
+    """SQL criteria for the status and due date filters (bounds are inclusive)"""
+    criteria = []
+    if statuses:
+        criteria.append(model.status.in_(statuses))
+    if due_after:
+        criteria.append(model.due_date >= due_after)
+    if due_before:
+        criteria.append(model.due_date <= due_before)
+    return criteria
+
+def sort_order(model, sort_column, descending):
+    """ORDER BY clauses for a keyset sort; missing values sort last, ids break ties"""
+    if sort_column is None:
+        return [model.id.desc() if descending else model.id]
+    key = sort_column.desc() if descending else sort_column.asc()
+    return [key.nulls_last(), model.id]
+
+# Keyset pagination
+def encode_cursor(position):
+    """Build an opaque cursor from a position dict.
+
+    The position holds the ``id`` of the last row served and, when
+    sorting by another column, that row's sort value as ``key``.
+    """
+    payload = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return the position dict stored in a cursor built by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(position['id'], int):
+            raise TypeError(position['id'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        abort(400, message='Invalid cursor.')
+    return position
+
+def keyset_criterion(model, sort_column, descending, position):
+    """Criterion selecting the rows that come after a cursor position"""
+    last_id = position['id']
+    if sort_column is None:
+        return model.id < last_id if descending else model.id > last_id
+    if 'key' not in position:
+        abort(400, message='Cursor does not match the requested sort.')
+    key = position['key']
+    if key is None:
+        return and_(sort_column.is_(None), model.id > last_id)
+    if sort_column.type.python_type is date:
+        try:
+            key = date.fromisoformat(key)
+        except (TypeError, ValueError):
+            abort(400, message='Invalid cursor.')
+    beyond = sort_column < key if descending else sort_column > key
+    return or_(beyond, and_(sort_column == key, model.id > last_id), sort_column.is_(None))
+
+def next_page_headers(cursor):
+    """Headers advertising the page that starts at cursor"""
+    args = request.args.copy()
+    args['cursor'] = cursor
+    next_url = f"{request.base_url}?{urlencode(list(args.items(multi=True)))}"
+    return {'X-Next-Cursor': cursor, 'Link': f'<{next_url}>; rel="next"'}
+
+def fetch_page(model, columns, args, *criteria, options=(), sort=(None, False)):
+    """Run a keyset-paginated, optionally projected query over model.
+
+    ``columns`` maps the public field names to their columns. When the
+    client asks for ``fields=``, only those columns (plus ``id`` and the
+    sort column, which the cursor needs) are selected and plain rows are
+    returned instead of ORM entities. ``sort`` is a ``(column, descending)``
+    pair; a None column sorts by id. Without ``limit`` or ``cursor``
+    every row is returned, as before pagination existed.
+
+    Returns a ``(rows, headers)`` tuple.
+    """
+    sort_column, descending = sort
+    only = args.get('only')
+    if only:
+        unknown = sorted(set(only) - set(columns))
+        if unknown:
+            abort(400, message=f"Unknown fields: {', '.join(unknown)}.")
+        selected = [model.id] + [
+            columns[name] for name in dict.fromkeys(only)
+            if name != 'id' and columns[name] is not None
+        ]
+        if sort_column is not None and sort_column not in selected:
+            selected.append(sort_column)
+        query = db.session.query(*selected)
+    else:
+        query = model.query.options(*options)
+    query = query.filter(*criteria)
+
+    paginated = 'limit' in args or 'cursor' in args
+    if 'cursor' in args:
+        query = query.filter(keyset_criterion(model, sort_column, descending, decode_cursor(args['cursor'])))
+    query = query.order_by(*sort_order(model, sort_column, descending))
+    if not paginated:
+        return query.all(), {}
+
+    limit = args.get('limit', current_app.config['API_PAGE_SIZE'])
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        position = {'id': rows[-1].id}
+        if sort_column is not None:
+            key = getattr(rows[-1], sort_column.key)
+            position['key'] = key.isoformat() if isinstance(key, date) else key
+        return rows, next_page_headers(encode_cursor(position))
+    return rows, {}
+
 # API Schemas
-class ProjectSchema(Schema):
+class DependencyList(fields.List):
+    """List of dependency ids, dumped from either ids or Task objects"""
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            return None
+        return [getattr(item, 'id', item) for item in value]
+
+class ProjectSummarySchema(TimedSchema):
+    total = fields.Int()
+    by_status = fields.Dict(keys=fields.Str(), values=fields.Int())
+    overdue = fields.Int()
+    next_due_date = fields.Date(allow_none=True)
+    percent_complete = fields.Float()
+
+class ProjectSchema(TimedSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     description = fields.Str()
+    version = fields.Int(dump_only=True)
+    summary = fields.Nested(ProjectSummarySchema, dump_only=True)
 
-class TaskSchema(Schema):
+class TaskSchema(TimedSchema):
     id = fields.Int(dump_only=True)
     title = fields.Str(required=True)
     description = fields.Str()
     status = fields.Str()
     due_date = fields.Date()
     project_id = fields.Int(required=True)
-    dependencies = fields.List(fields.Int())
+    dependencies = DependencyList(fields.Int())
+    version = fields.Int(dump_only=True)
+    completed_at = fields.DateTime(dump_only=True, allow_none=True)
+
+class TaskBatchItemSchema(TaskSchema):
+    id = fields.Int(required=True)
+    # The version the change is based on; stale items fail with 412
+    version = fields.Int()
+
+class TaskBatchSchema(TimedSchema):
+    tasks = fields.List(
+        fields.Dict(), required=True,
+        validate=validate.Length(min=1, max=Config.API_MAX_BATCH_SIZE)
+    )
+
+class TaskBatchResultSchema(TimedSchema):
+    index = fields.Int()
+    status = fields.Int()
+    task = fields.Nested(TaskSchema)
+    errors = fields.Dict()
+
+class BatchResultSchema(TimedSchema):
+    results = fields.List(fields.Nested(TaskBatchResultSchema))
+
+class TaskOrderSchema(TimedSchema):
+    order = fields.List(fields.Int())
+
+class CriticalPathSchema(TimedSchema):
+    tasks = fields.List(fields.Int())
+    finish_date = fields.Date(allow_none=True)
+
+class BlockersSchema(TimedSchema):
+    blockers = fields.List(fields.Int())
+
+class TemplateApplySchema(TimedSchema):
+    project_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1))
+    start_date = fields.Date()
+
+class TemplateApplyResultSchema(TimedSchema):
+    created = fields.Dict(keys=fields.Str(), values=fields.List(fields.Int()))
+
+class JobSchema(TimedSchema):
+    id = fields.Int()
+    name = fields.Str()
+    status = fields.Str()
+    attempts = fields.Int()
+    result = fields.Raw()
+    error = fields.Str()
+    created_at = fields.DateTime()
+    started_at = fields.DateTime()
+    finished_at = fields.DateTime()
+
+class ExportArgsSchema(TimedSchema):
+    format = fields.Str(load_default='ndjson', validate=validate.OneOf(['ndjson', 'csv']))
+
+class EventStreamArgsSchema(TimedSchema):
+    since = fields.Int(validate=validate.Range(min=0))
+
+class ImportResultSchema(TimedSchema):
+    projects = fields.Int()
+    tasks = fields.Int()
+    dependencies = fields.Int()
+
+class SearchArgsSchema(TimedSchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1))
+    type = fields.Str(validate=validate.OneOf(['task', 'project']))
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=Config.API_MAX_PAGE_SIZE))
+    offset = fields.Int(load_default=0, validate=validate.Range(min=0))
+
+class SearchResultSchema(TimedSchema):
+    type = fields.Str()
+    id = fields.Int()
+    project_id = fields.Int()
+    title = fields.Str()
+    score = fields.Float()
+
+class PageArgsSchema(TimedSchema):
+    limit = fields.Int(validate=validate.Range(min=1, max=Config.API_MAX_PAGE_SIZE))
+    cursor = fields.Str()
+    only = DelimitedList(fields.Str(), data_key='fields')
+
+class ProjectListArgsSchema(PageArgsSchema):
+    include = DelimitedList(fields.Str(validate=validate.OneOf(['summary'])), load_default=[])
+
+class TaskListArgsSchema(PageArgsSchema):
+    ready = fields.Bool()
+    status = DelimitedList(fields.Str())
+    due_after = fields.Date()
+    due_before = fields.Date()
+    sort = fields.Str(load_default='id', validate=validate.OneOf(list(TASK_SORTS)))
+    include_archived = fields.Bool(load_default=False)
+
+class TaskArgsSchema(TimedSchema):
+    include_archived = fields.Bool(load_default=False)
+
+class ArchiveSchema(TimedSchema):
+    older_than_days = fields.Int(validate=validate.Range(min=0))
+
+PROJECT_FIELDS = {
+    'id': Project.id,
+    'name': Project.name,
+    'description': Project.description,
+    'version': Project.version,
+}
+
+TASK_FIELDS = {
+    'id': Task.id,
+    'title': Task.title,
+    'description': Task.description,
+    'status': Task.status,
+    'due_date': Task.due_date,
+    'version': Task.version,
+    'project_id': Task.project_id,
+    'completed_at': Task.completed_at,
+    'dependencies': None,  # Not a column; loaded by attach_dependency_ids
+}
+
+ARCHIVED_TASK_FIELDS = {
+    name: None if column is None else getattr(ArchivedTask, name) for name, column in TASK_FIELDS.items()
+}
+
+def field_columns(columns):
+    """The columns behind a field map, skipping fields that are not columns"""
+    return [column for column in columns.values() if column is not None]
+
+def attach_dependency_ids(rows, archived=False):
+    """Turn projected task rows into dicts carrying their dependency ids.
+
+    With ``archived``, the rows may also be archived tasks.
+    """
+    items = [row._asdict() for row in rows]
+    if not items:
+        return items
+    by_id = {item['id']: item for item in items}
+    for item in items:
+        item['dependencies'] = []
+    edges = select(task_dependencies.c.task_id, task_dependencies.c.dependency_id).where(
+        task_dependencies.c.task_id.in_(by_id)
+    )
+    if archived:
+        edges = union_all(edges, select(
+            archived_task_dependencies.c.task_id, archived_task_dependencies.c.dependency_id
+        ).where(archived_task_dependencies.c.task_id.in_(by_id)))
+    edges = db.session.execute(edges.order_by(edges.selected_columns.dependency_id))
+    for task_id, dependency_id in edges:
+        by_id[task_id]['dependencies'].append(dependency_id)
+    return items
+
+def load_dependencies(dependency_ids):
+    """Load the tasks for a list of dependency ids in a single IN query"""
+    dependency_ids = {int(dependency_id) for dependency_id in dependency_ids}
+    if not dependency_ids:
+        return []
+    return Task.query.filter(Task.id.in_(dependency_ids)).all()
+
+def existing_task_ids(task_ids):
+    """Return which of task_ids exist, using a single IN query"""
+    return set(task_project_ids(task_ids))
+
+def task_project_ids(task_ids):
+    """Map the existing ids among task_ids to their project id, using a single IN query"""
+    task_ids = set(task_ids)
+    if not task_ids:
+        return {}
+    return dict(db.session.query(Task.id, Task.project_id).filter(Task.id.in_(task_ids)).all())
+
+def set_dependencies(task, dependency_ids):
+    """Give a task new dependencies, inserting and deleting only the edges that change.
+
+    Unknown ids are ignored. Returns whether anything changed; if so the
+    task's version is bumped, since its row is otherwise untouched.
+    """
+    current = set(db.session.scalars(
+        select(task_dependencies.c.dependency_id).where(task_dependencies.c.task_id == task.id)
+    ))
+    wanted = existing_task_ids(int(dependency_id) for dependency_id in dependency_ids)
+    added, removed = wanted - current, current - wanted
+    if not added and not removed:
+        return False
+    insert_dependency_edges((task.id, dependency_id) for dependency_id in sorted(added))
+    if removed:
+        db.session.execute(task_dependencies.delete().where(
+            task_dependencies.c.task_id == task.id,
+            task_dependencies.c.dependency_id.in_(removed)
+        ))
+    db.session.expire(task, ['dependencies'])
+    task.version += 1
+    return True
+
+def insert_dependency_edges(edges):
+    """Insert (task_id, dependency_id) pairs with one executemany"""
+    rows = [{'task_id': task_id, 'dependency_id': dependency_id} for task_id, dependency_id in edges]
+    if rows:
+        db.session.execute(task_dependencies.insert(), rows)
+
+def load_dependency_graph(project_ids):
+    """Load the dependency graph of some projects: one query for edges, one for tasks.
+
+    Dependencies on tasks of other projects are included as nodes, but
+    their own edges are not.
+    """
+    project_tasks = select(Task.id).where(Task.project_id.in_(project_ids))
+    edges = db.session.execute(
+        select(task_dependencies.c.task_id, task_dependencies.c.dependency_id)
+        .where(task_dependencies.c.task_id.in_(project_tasks))
+    ).all()
+    nodes = db.session.execute(
+        select(Task.id, Task.status, Task.due_date).where(or_(
+            Task.project_id.in_(project_ids),
+            Task.id.in_(
+                select(task_dependencies.c.dependency_id)
+                .where(task_dependencies.c.task_id.in_(project_tasks))
+            ),
+        ))
+    ).all()
+    return DependencyGraph(nodes, edges)
+
+def reachable_dependencies(task_ids, skipped=()):
+    """Recursive CTE of the stored ``(task_id, dependency_id)`` edges reachable from task_ids.
+
+    The walk follows dependencies across projects and leaves out the
+    edges of the ``skipped`` tasks.
+    """
+    stored = select(task_dependencies.c.task_id, task_dependencies.c.dependency_id).where(
+        task_dependencies.c.task_id.not_in(list(skipped))
+    ).subquery('stored')
+    reachable = (
+        select(stored.c.task_id, stored.c.dependency_id)
+        .where(stored.c.task_id.in_(list(task_ids)))
+        .cte('reachable', recursive=True)
+    )
+    # UNION rather than UNION ALL, so the walk ends on stored cycles
+    return reachable.union(
+        select(stored.c.task_id, stored.c.dependency_id)
+        .join(reachable, stored.c.task_id == reachable.c.dependency_id)
+    )
+
+def reachable_dependency_edges(relinked):
+    """Return the edges reachable from the new dependencies of ``relinked``.
+
+    ``relinked`` maps task ids to the dependency ids they are about to
+    get; those replace the stored edges of these tasks. The walk follows
+    dependencies across projects, in one recursive query.
+    """
+    new_edges = [
+        (task_id, int(dependency_id))
+        for task_id, dependency_ids in relinked.items()
+        for dependency_id in dependency_ids
+    ]
+    starts = {dependency_id for _, dependency_id in new_edges}
+    if not starts:
+        return new_edges
+    return new_edges + db.session.execute(select(reachable_dependencies(starts, skipped=relinked))).all()
+
+def find_dependency_cycle(relinked):
+    """Return ``(task_id, cycle)`` if giving tasks new dependencies would create a cycle.
+
+    ``relinked`` maps task ids to their new dependency ids. Returns None
+    when the change keeps the graph acyclic.
+    """
+    edges = reachable_dependency_edges(relinked)
+    task_ids = set(relinked).union(*edges)
+    graph = DependencyGraph(((task_id, None, None) for task_id in task_ids), edges)
+    for task_id in relinked:
+        cycle = graph.cycle_through(task_id)
+        if cycle:
+            return task_id, cycle
+    return None
+
+def dependent_task_ids(task_ids):
+    """Return the ids of the tasks that depend on any of task_ids"""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    return db.session.scalars(
+        select(task_dependencies.c.task_id)
+        .where(task_dependencies.c.dependency_id.in_(task_ids))
+        .distinct()
+    ).all()
+
+def open_dependency_count_query(task_table):
+    """Correlated subquery counting the unfinished dependencies of a task row"""
+    dependency = Task.__table__.alias('dependency')
+    return (
+        select(func.count())
+        .select_from(task_dependencies.join(dependency, dependency.c.id == task_dependencies.c.dependency_id))
+        .where(
+            task_dependencies.c.task_id == task_table.c.id,
+            func.coalesce(dependency.c.status, '') != 'Done'
+        )
+        .scalar_subquery()
+    )
+
+def refresh_open_dependency_counts(task_ids=(), dependency_ids=()):
+    """Recompute open_dependency_count for the affected tasks with one UPDATE.
+
+    ``task_ids`` are tasks whose own dependencies changed;
+    ``dependency_ids`` are tasks whose status changed, so their
+    dependents get refreshed. When deleting tasks, collect their
+    dependents with dependent_task_ids() beforehand and pass them as
+    ``task_ids`` once the rows are gone.
+    """
+    task_ids, dependency_ids = list(task_ids), list(dependency_ids)
+    if not task_ids and not dependency_ids:
+        return
+    db.session.flush()
+    table = Task.__table__
+    affected = [table.c.id.in_(task_ids)]
+    if dependency_ids:
+        affected.append(table.c.id.in_(
+            select(task_dependencies.c.task_id).where(task_dependencies.c.dependency_id.in_(dependency_ids))
+        ))
+    project_ids = db.session.scalars(
+        update(table).where(or_(*affected))
+        .values(open_dependency_count=open_dependency_count_query(table))
+        .returning(table.c.project_id)
+    ).all()
+    # Readiness changed, so the ready/blocked listings are stale
+    invalidate_tasks(project_ids=set(project_ids))
+
+def delete_dependency_edges(task_ids):
+    """Drop every dependency of the given tasks with one DELETE"""
+    if task_ids:
+        db.session.execute(
+            task_dependencies.delete().where(task_dependencies.c.task_id.in_(task_ids))
+        )
+
+def delete_tasks(task_ids, project_ids=()):
+    """Delete tasks and every dependency edge touching them with set-based DELETEs.
+
+    The tasks left depending on them get their ready counts refreshed.
+    ``project_ids`` are the projects whose cached task lists to drop.
+    """
+    task_ids = list(task_ids)
+    deleted = set(task_ids)
+    dependents = [task_id for task_id in dependent_task_ids(task_ids) if task_id not in deleted]
+    db.session.execute(task_dependencies.delete().where(or_(
+        task_dependencies.c.task_id.in_(task_ids),
+        task_dependencies.c.dependency_id.in_(task_ids)
+    )))
+    removed = dict(db.session.execute(
+        delete(Task).where(Task.id.in_(task_ids)).returning(Task.id, Task.project_id)
+    ).all())
+    record_task_events('deleted', removed, removed)
+    # The dependents lost edges, which changes their representation
+    if dependents:
+        table = Task.__table__
+        db.session.execute(update(table).where(table.c.id.in_(dependents)).values(version=table.c.version + 1))
+        record_task_events('updated', dependents)
+    archived_dependents = set(db.session.scalars(
+        archived_task_dependencies.delete()
+        .where(archived_task_dependencies.c.dependency_id.in_(task_ids))
+        .returning(archived_task_dependencies.c.task_id)
+    ))
+    if archived_dependents:
+        table = ArchivedTask.__table__
+        db.session.execute(
+            update(table).where(table.c.id.in_(archived_dependents)).values(version=table.c.version + 1)
+        )
+    refresh_open_dependency_counts(task_ids=dependents)
+    invalidate_tasks([*task_ids, *dependents, *archived_dependents], project_ids)
+
+def project_task_count(project_id):
+    return db.session.scalar(select(func.count()).where(Task.project_id == project_id))
+
+def delete_project_rows(project_id, chunk_size=None):
+    """Delete a project and its tasks with set-based DELETEs.
+
+    With chunk_size, tasks are deleted chunk_size at a time and every
+    chunk is committed, so a huge project never holds one long
+    transaction and an interrupted run can simply be repeated. Without
+    it nothing is committed.
+    """
+    project_tasks = select(Task.id).where(Task.project_id == project_id).order_by(Task.id)
+    while True:
+        task_ids = db.session.scalars(project_tasks.limit(chunk_size) if chunk_size else project_tasks).all()
+        if not task_ids:
+            break
+        delete_tasks(task_ids, [project_id])
+        if not chunk_size:
+            break
+        db.session.commit()
+    archived = select(ArchivedTask.id).where(ArchivedTask.project_id == project_id)
+    db.session.execute(archived_task_dependencies.delete().where(or_(
+        archived_task_dependencies.c.task_id.in_(archived),
+        archived_task_dependencies.c.dependency_id.in_(archived)
+    )))
+    db.session.execute(delete(ArchivedTask).where(ArchivedTask.project_id == project_id))
+    db.session.execute(delete(Project).where(Project.id == project_id))
+    invalidate_projects([project_id], deleted=True)
+
+@job_queue.handler('delete_project')
+def delete_project_job(project_id):
+    delete_project_rows(project_id, current_app.config['API_STREAM_CHUNK_SIZE'])
+    db.session.commit()
+    return {'project_id': project_id}
+
+# Archiving
+def stamp_unknown_completions(now):
+    """Give done tasks without a completion time (imported, created from
+    templates, or done before it was recorded) the time ``now``"""
+    table = Task.__table__
+    stamped = db.session.execute(
+        update(table).where(table.c.status == 'Done', table.c.completed_at.is_(None))
+        .values(completed_at=now, version=table.c.version + 1)
+        .returning(table.c.id, table.c.project_id)
+    ).all()
+    invalidate_tasks([task_id for task_id, _ in stamped], {project_id for _, project_id in stamped})
+
+def archivable_criteria(cutoff):
+    return [Task.status == 'Done', Task.completed_at < cutoff]
+
+def dependents_first(task_ids, edges):
+    """Order task ids so that every task comes before its dependencies"""
+    graph = DependencyGraph(((task_id, 'Done', None) for task_id in task_ids), edges)
+    try:
+        return graph.topological_order()[::-1]
+    except CycleError:
+        return sorted(task_ids, reverse=True)
+
+def archive_task_chunk(task_ids, cutoff, now):
+    """Move those of task_ids that can be archived into the archive.
+
+    A task qualifies while it is still done since before cutoff and no
+    task outside the archived ones depends on it. Returns ``{task_id:
+    project_id}`` for the archived tasks.
+    """
+    eligible = set(db.session.scalars(select(Task.id).where(Task.id.in_(task_ids), *archivable_criteria(cutoff))))
+    edges = db.session.execute(
+        select(task_dependencies.c.task_id, task_dependencies.c.dependency_id)
+        .where(task_dependencies.c.dependency_id.in_(eligible))
+    ).all()
+    # Keeping a task keeps its dependencies, and theirs in turn
+    dependencies = {}
+    for task_id, dependency_id in edges:
+        dependencies.setdefault(task_id, []).append(dependency_id)
+    kept = [dependency_id for task_id, dependency_id in edges if task_id not in eligible]
+    while kept:
+        task_id = kept.pop()
+        if task_id in eligible:
+            eligible.discard(task_id)
+            kept.extend(dependencies.get(task_id, ()))
+    if not eligible:
+        return {}
+
+    columns = field_columns(TASK_FIELDS)
+    db.session.execute(insert(ArchivedTask).from_select(
+        [column.key for column in columns] + ['archived_at'],
+        select(*columns, literal(now, db.DateTime)).where(Task.id.in_(eligible))
+    ))
+    db.session.execute(insert(archived_task_dependencies).from_select(
+        ['task_id', 'dependency_id'],
+        select(task_dependencies.c.task_id, task_dependencies.c.dependency_id)
+        .where(task_dependencies.c.task_id.in_(eligible))
+    ))
+    delete_dependency_edges(list(eligible))
+    archived = dict(db.session.execute(
+        delete(Task).where(Task.id.in_(eligible)).returning(Task.id, Task.project_id)
+    ).all())
+    record_task_events('archived', archived, archived)
+    invalidate_tasks(archived, set(archived.values()))
+    return archived
+
+def archive_completed_tasks(older_than_days, chunk_size):
+    """Archive the tasks done more than older_than_days ago, committing
+    every chunk_size tasks, and return how many were archived.
+
+    Projects are handled one at a time, dependents before their
+    dependencies. A task whose dependent is done but not yet old enough,
+    or lives in a project handled later, stays until a later run.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    stamp_unknown_completions(now)
+    db.session.commit()
+    project_ids = db.session.scalars(
+        select(Task.project_id).where(*archivable_criteria(cutoff)).distinct().order_by(Task.project_id)
+    ).all()
+    count = 0
+    for project_id in project_ids:
+        candidates = select(Task.id).where(Task.project_id == project_id, *archivable_criteria(cutoff))
+        task_ids = db.session.scalars(candidates).all()
+        edges = db.session.execute(
+            select(task_dependencies.c.task_id, task_dependencies.c.dependency_id)
+            .where(task_dependencies.c.task_id.in_(candidates))
+        ).all()
+        order = dependents_first(task_ids, edges)
+        for start in range(0, len(order), chunk_size):
+            count += len(archive_task_chunk(order[start:start + chunk_size], cutoff, now))
+            db.session.commit()
+    return count
+
+@job_queue.handler('archive_tasks')
+def archive_tasks_job(older_than_days):
+    count = archive_completed_tasks(older_than_days, current_app.config['TASK_ARCHIVE_CHUNK_SIZE'])
+    return {'archived': count}
+
+# Optimistic concurrency
+# Single-resource GETs return ``ETag: "<id>-<version>"``. PUT and DELETE
+# must send it back in If-Match; a write that loses the race against a
+# concurrent one fails with StaleDataError and becomes a 409. Any flush
+# can raise it, not only the commit, so the guard covers every write.
+def version_etag(obj):
+    return f'{obj.id}-{obj.version}'
+
+def version_headers(obj):
+    return {'ETag': f'"{version_etag(obj)}"'}
+
+def require_if_match(obj):
+    """Abort with 428 without If-Match, or 412 if it doesn't name obj's current version"""
+    if not request.if_match:
+        if current_app.config['API_REQUIRE_IF_MATCH']:
+            abort(428, message='Send the ETag of the resource in an If-Match header.')
+        return
+    if not request.if_match.contains(version_etag(obj)):
+        abort(412, message='The resource has changed since it was read; fetch it again.')
+
+def claim_version(obj):
+    """Bump obj's version if it is still the one that was read, else abort with 409.
+
+    Set-based writes such as DELETE bypass the ORM's version check; this
+    locks the row first so a concurrent update can't slip in between.
+    """
+    table = type(obj).__table__
+    result = db.session.execute(
+        update(table).where(table.c.id == obj.id, table.c.version == obj.version)
+        .values(version=table.c.version + 1)
+    )
+    if result.rowcount != 1:
+        abort(409, message='The resource was changed by a concurrent request.')
+
+@contextmanager
+def conflict_on_stale_version():
+    """Answer 409 when a flush or commit in the block finds that a
+    concurrent write changed the same rows first"""
+    try:
+        yield
+    except StaleDataError:
+        db.session.rollback()
+        abort(409, message='The resource was changed by a concurrent request.')
+
+def commit_or_conflict():
+    """Commit, answering 409 when a concurrent write changed the same rows first"""
+    with conflict_on_stale_version():
+        db.session.commit()
+
+def job_accepted(job):
+    """202 response pointing the client to the status of a queued job"""
+    location = url_for('tasks.JobResource', job_id=job.id)
+    return jsonify(JobSchema().dump(job)), 202, {'Location': location}
 
 # Blueprint for API
 blp = Blueprint('tasks', __name__, description='Operations on tasks and projects')
 
 # API Routes
 @blp.route('/projects')
-class ProjectList(Resource):
+class ProjectList(MethodView):
+    @replica_router.read_only
+    # Summaries change with every task write and are cached per project instead
+    @response_cache.cached('projects', unless=lambda: 'include' in request.args)
+    @blp.arguments(ProjectListArgsSchema, location='query')
     @blp.response(200, ProjectSchema(many=True))
-    def get(self):
-        """Get all projects"""
-        return Project.query.all()
+    def get(self, args):
+        """Get all projects
+
+        Pass ``limit`` to page through the results; the next page is
+        advertised in the ``X-Next-Cursor`` and ``Link`` headers. Pass
+        ``fields=id,name`` to only return some fields, and
+        ``include=summary`` to add each project's task counts per status,
+        overdue count, next due date and percent complete.
+        """
+        fast = current_app.config['API_FAST_JSON']
+        if fast:
+            args.setdefault('only', list(PROJECT_FIELDS))
+        projects, headers = fetch_page(Project, PROJECT_FIELDS, args)
+        if 'summary' in args['include']:
+            projects = attach_summaries(projects)
+        if fast:
+            return json_response(as_dicts(projects)), headers
+        return projects, headers
 
     @blp.arguments(ProjectSchema)
     @blp.response(201, ProjectSchema)
@@ -97,41 +1403,104 @@ class ProjectList(Resource):
         """Create a new project"""
         project = Project(**new_project)
         db.session.add(project)
+        invalidate_projects()
         db.session.commit()
         return project
 
 @blp.route('/projects/<int:project_id>')
-class ProjectResource(Resource):
+class ProjectResource(MethodView):
+    @replica_router.read_only
+    @response_cache.cached('project:{project_id}')
     @blp.response(200, ProjectSchema)
     def get(self, project_id):
-        """Get a project by ID"""
+        """Get a project by ID
+
+        The ``ETag`` identifies the project's version; send it back in
+        ``If-Match`` to update or delete the project.
+        """
         project = Project.query.get_or_404(project_id)
-        return project
+        return project, version_headers(project)
 
     @blp.arguments(ProjectSchema)
     @blp.response(200, ProjectSchema)
     def put(self, update_data, project_id):
-        """Update a project"""
+        """Update a project
+
+        Requires ``If-Match`` with the project's ETag: ``428`` without it,
+        ``412`` if the project changed since, ``409`` if a concurrent
+        update wins the race.
+        """
         project = Project.query.get_or_404(project_id)
+        require_if_match(project)
         project.name = update_data.get('name', project.name)
         project.description = update_data.get('description', project.description)
-        db.session.commit()
-        return project
+        invalidate_projects([project.id])
+        commit_or_conflict()
+        return project, version_headers(project)
 
     @blp.response(204)
+    @blp.alt_response(202, schema=JobSchema)
     def delete(self, project_id):
-        """Delete a project"""
+        """Delete a project
+
+        Requires ``If-Match`` like PUT. Projects with more than
+        ``API_ASYNC_THRESHOLD`` tasks are deleted by a background job: the
+        response is ``202`` with the job, whose status can be polled at
+        ``/jobs/<id>``.
+        """
         project = Project.query.get_or_404(project_id)
-        db.session.delete(project)
+        require_if_match(project)
+        claim_version(project)
+        if project_task_count(project_id) > current_app.config['API_ASYNC_THRESHOLD']:
+            job = enqueue_job('delete_project', project_id=project_id)
+            db.session.commit()
+            return job_accepted(job)
+        delete_project_rows(project_id)
         db.session.commit()
         return '', 204
 
 @blp.route('/projects/<int:project_id>/tasks')
-class TaskList(Resource):
+class TaskList(MethodView):
+    @replica_router.read_only
+    @response_cache.cached('project:{project_id}:tasks')
+    @blp.arguments(TaskListArgsSchema, location='query')
     @blp.response(200, TaskSchema(many=True))
-    def get(self, project_id):
-        """Get all tasks for a project"""
-        return Task.query.filter_by(project_id=project_id).all()
+    def get(self, args, project_id):
+        """Get all tasks for a project
+
+        Supports the same ``limit``, ``cursor`` and ``fields`` parameters
+        as the project list. ``ready=true`` only returns unfinished tasks
+        whose dependencies are all done, ``ready=false`` the tasks still
+        waiting on a dependency.
+
+        ``status`` (comma-separated), ``due_after`` and ``due_before``
+        (inclusive) filter the tasks; ``sort`` is one of ``id``, ``-id``,
+        ``due_date`` or ``-due_date``. Tasks without a due date come last.
+        ``include_archived=true`` adds the project's archived tasks.
+        """
+        # The fast path projects every field and encodes the rows directly
+        fast = current_app.config['API_FAST_JSON']
+        if fast:
+            args.setdefault('only', list(TASK_FIELDS))
+        filters = args.get('status'), args.get('due_after'), args.get('due_before')
+        if args['include_archived'] and 'ready' not in args:
+            return archived_task_page(project_id, args, filters, fast)
+        criteria = [Task.project_id == project_id]
+        criteria += task_filter_criteria(*filters)
+        if args.get('ready') is True:
+            criteria += [Task.open_dependency_count == 0, Task.status != 'Done']
+        elif args.get('ready') is False:
+            criteria.append(Task.open_dependency_count > 0)
+        tasks, headers = fetch_page(
+            Task, TASK_FIELDS, args, *criteria,
+            options=[selectinload(Task.dependencies).load_only(Task.id)],
+            sort=TASK_SORTS[args['sort']]
+        )
+        if 'dependencies' in args.get('only', ()):
+            tasks = attach_dependency_ids(tasks)
+        if fast:
+            return json_response(as_dicts(tasks)), headers
+        return tasks, headers
 
     @blp.arguments(TaskSchema)
     @blp.response(201, TaskSchema)
@@ -140,68 +1509,823 @@ class TaskList(Resource):
         # Validate project exists
         project = Project.query.get_or_404(project_id)
 
+        # The project comes from the URL
+        new_task.pop('project_id', None)
+        dependency_ids = new_task.pop('dependencies', [])
+
         # Create the task
         task = Task(project_id=project_id, **new_task)
 
         # Handle dependencies
-        if 'dependencies' in new_task:
-            for dependency_id in new_task['dependencies']:
-                dependency = Task.query.get(dependency_id)
-                if dependency:
-                    task.dependencies.append(dependency)
+        task.dependencies = load_dependencies(dependency_ids)
 
         db.session.add(task)
+        db.session.flush()
+        refresh_open_dependency_counts(task_ids=[task.id])
+        record_task_events('created', [task.id])
+        invalidate_tasks(project_ids=[project_id])
         db.session.commit()
         return task
 
+def archived_task_page(project_id, args, filters, fast):
+    """A page of a project's live and archived tasks, listed as one"""
+    live = select(*field_columns(TASK_FIELDS)).where(
+        Task.project_id == project_id, *task_filter_criteria(*filters)
+    )
+    archived = select(*field_columns(ARCHIVED_TASK_FIELDS)).where(
+        ArchivedTask.project_id == project_id, *task_filter_criteria(*filters, model=ArchivedTask)
+    )
+    tasks = union_all(live, archived).subquery()
+    # The union has no entities to load, so it is always projected
+    args.setdefault('only', list(TASK_FIELDS))
+    sort_column, descending = TASK_SORTS[args['sort']]
+    if sort_column is not None:
+        sort_column = tasks.c[sort_column.key]
+    columns = {name: None if column is None else tasks.c[name] for name, column in TASK_FIELDS.items()}
+    rows, headers = fetch_page(tasks.c, columns, args, sort=(sort_column, descending))
+    if 'dependencies' in args['only']:
+        rows = attach_dependency_ids(rows, archived=True)
+    if fast:
+        return json_response(as_dicts(rows)), headers
+    return rows, headers
+
+def load_batch_items(items, schema, partial):
+    """Validate raw batch items one by one.
+
+    Returns ``(valid, results)`` where ``valid`` maps item index to the
+    loaded data and ``results`` holds a 422 entry for each invalid item.
+    """
+    valid, results = {}, {}
+    for index, item in enumerate(items):
+        try:
+            valid[index] = schema.load(item, partial=partial)
+        except ValidationError as err:
+            results[index] = {'index': index, 'status': 422, 'errors': err.messages}
+    return valid, results
+
+def reject_unknown_dependencies(valid, results):
+    """Resolve every dependency id of a batch at once and drop items with unknown ones"""
+    known = existing_task_ids(
+        dependency_id for data in valid.values() for dependency_id in data.get('dependencies', ())
+    )
+    for index, data in list(valid.items()):
+        unknown = sorted(set(data.get('dependencies', ())) - known)
+        if unknown:
+            del valid[index]
+            results[index] = {
+                'index': index, 'status': 422,
+                'errors': {'dependencies': [f'Unknown task ids: {unknown}']}
+            }
+
+def reject_dependency_cycles(valid, results):
+    """Drop batch items whose new dependencies would close a cycle"""
+    indexes = {data['id']: index for index, data in valid.items() if 'dependencies' in data}
+    while indexes:
+        found = find_dependency_cycle({task_id: valid[index]['dependencies'] for task_id, index in indexes.items()})
+        if found is None:
+            break
+        task_id, cycle = found
+        index = indexes.pop(task_id)
+        del valid[index]
+        results[index] = {'index': index, 'status': 409, 'errors': {'dependencies': [str(CycleError(cycle))]}}
+
+@blp.route('/projects/<int:project_id>/tasks:batch')
+class TaskBatchCreate(MethodView):
+    @blp.arguments(TaskBatchSchema)
+    @blp.response(200, BatchResultSchema)
+    def post(self, batch, project_id):
+        """Create many tasks for a project
+
+        Every item is validated on its own and reported in ``results``
+        with its index and status; valid items are created in a single
+        transaction even if others are rejected.
+        """
+        Project.query.get_or_404(project_id)
+        valid, results = load_batch_items(batch['tasks'], TaskSchema(), partial=('project_id',))
+        reject_unknown_dependencies(valid, results)
+
+        if valid:
+            default_due_date = (datetime.utcnow() + timedelta(days=2)).date()
+            indexes = list(valid)
+            rows = [{
+                'title': valid[index]['title'],
+                'description': valid[index].get('description'),
+                'status': valid[index].get('status', 'To Do'),
+                'due_date': valid[index].get('due_date', default_due_date),
+                'project_id': project_id,
+            } for index in indexes]
+            now = datetime.utcnow()
+            for row in rows:
+                row['completed_at'] = now if row['status'] == 'Done' else None
+            new_ids = db.session.scalars(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+            ).all()
+
+            edges = []
+            for index, row, task_id in zip(indexes, rows, new_ids):
+                dependency_ids = sorted(set(valid[index].get('dependencies', ())))
+                edges.extend((task_id, dependency_id) for dependency_id in dependency_ids)
+                results[index] = {
+                    'index': index, 'status': 201,
+                    'task': dict(row, id=task_id, dependencies=dependency_ids)
+                }
+            insert_dependency_edges(edges)
+            refresh_open_dependency_counts(task_ids={task_id for task_id, _ in edges})
+            record_task_events('created', new_ids)
+            invalidate_tasks(project_ids=[project_id])
+            db.session.commit()
+
+        return {'results': [results[index] for index in sorted(results)]}
+
+@blp.route('/tasks:batch')
+class TaskBatchUpdate(MethodView):
+    @blp.arguments(TaskBatchSchema)
+    @blp.response(200, BatchResultSchema)
+    def patch(self, batch):
+        """Update many tasks
+
+        Each item needs the task ``id`` plus the fields to change, and may
+        carry the ``version`` the change is based on (``412`` if the task
+        changed since). Items are reported in ``results`` like for batch
+        creation; the whole batch fails with ``409`` if a concurrent
+        request updates one of its tasks first.
+        """
+        schema = TaskBatchItemSchema()
+        partial = tuple(name for name in schema.fields if name != 'id')
+        valid, results = load_batch_items(batch['tasks'], schema, partial=partial)
+
+        ids = [data['id'] for data in valid.values()]
+        seen, projects = set(), task_project_ids(ids)
+        current = {
+            task_id: (version, status)
+            for task_id, version, status in db.session.execute(
+                select(Task.id, Task.version, Task.status).where(Task.id.in_(ids))
+            )
+        }
+        versions = {task_id: version for task_id, (version, _) in current.items()}
+        for index, data in list(valid.items()):
+            if data['id'] not in projects:
+                del valid[index]
+                results[index] = {'index': index, 'status': 404, 'errors': {'id': ['Task not found.']}}
+            elif data['id'] in seen:
+                del valid[index]
+                results[index] = {'index': index, 'status': 422, 'errors': {'id': ['Duplicate task id in batch.']}}
+            elif data.setdefault('version', versions[data['id']]) != versions[data['id']]:
+                del valid[index]
+                results[index] = {'index': index, 'status': 412, 'errors': {'version': ['The task has changed.']}}
+            seen.add(data['id'])
+        reject_unknown_dependencies(valid, results)
+        reject_dependency_cycles(valid, results)
+
+        if valid:
+            # The project of a task can't be changed, as in TaskResource.put.
+            # Passing the version makes every UPDATE check and bump it.
+            rows = [
+                {key: value for key, value in data.items() if key not in ('dependencies', 'project_id')}
+                for data in valid.values()
+            ]
+            now = datetime.utcnow()
+            for row in rows:
+                if 'status' in row and (row['status'] == 'Done') != (current[row['id']][1] == 'Done'):
+                    row['completed_at'] = now if row['status'] == 'Done' else None
+            try:
+                db.session.execute(update(Task), rows)
+            except StaleDataError:
+                db.session.rollback()
+                abort(409, message='A task was changed by a concurrent request.')
+
+            relinked = {data['id']: set(data['dependencies']) for data in valid.values() if 'dependencies' in data}
+            delete_dependency_edges(list(relinked))
+            insert_dependency_edges(
+                (task_id, dependency_id)
+                for task_id, dependency_ids in relinked.items()
+                for dependency_id in sorted(dependency_ids)
+            )
+            refresh_open_dependency_counts(
+                task_ids=relinked,
+                dependency_ids=[data['id'] for data in valid.values() if 'status' in data]
+            )
+            updated = [data['id'] for data in valid.values()]
+            for data in valid.values():
+                record_task_events(update_event(current[data['id']][1], data.get('status')), [data['id']])
+            invalidate_tasks(updated, {projects[task_id] for task_id in updated})
+            db.session.commit()
+
+            tasks = Task.query.options(selectinload(Task.dependencies).load_only(Task.id)).filter(
+                Task.id.in_([data['id'] for data in valid.values()])
+            )
+            tasks = {task.id: task for task in tasks}
+            for index, data in valid.items():
+                results[index] = {'index': index, 'status': 200, 'task': tasks[data['id']]}
+
+        return {'results': [results[index] for index in sorted(results)]}
+
+@blp.route('/tasks:archive')
+class TaskArchive(MethodView):
+    @blp.arguments(ArchiveSchema)
+    @blp.response(202, JobSchema)
+    def post(self, args):
+        """Archive tasks done for a while
+
+        Moves the tasks done more than ``older_than_days`` days ago
+        (``TASK_ARCHIVE_AFTER_DAYS`` by default) to the archive, along with
+        their dependencies. Tasks that an unarchived task depends on stay.
+        Runs as a background job; poll the returned job for the count.
+        """
+        days = args.get('older_than_days', current_app.config['TASK_ARCHIVE_AFTER_DAYS'])
+        job = enqueue_job('archive_tasks', older_than_days=days)
+        db.session.commit()
+        return job_accepted(job)
+
 @blp.route('/tasks/<int:task_id>')
-class TaskResource(Resource):
+class TaskResource(MethodView):
+    @replica_router.read_only
+    @response_cache.cached('task:{task_id}')
+    @blp.arguments(TaskArgsSchema, location='query')
     @blp.response(200, TaskSchema)
-    def get(self, task_id):
-        """Get a task by ID"""
+    def get(self, args, task_id):
+        """Get a task by ID
+
+        The ``ETag`` identifies the task's version; send it back in
+        ``If-Match`` to update or delete the task. With
+        ``include_archived=true`` an archived task is returned as well;
+        archived tasks can't be changed.
+        """
+        if current_app.config['API_FAST_JSON'] or args['include_archived']:
+            row = db.session.query(*field_columns(TASK_FIELDS)).filter(Task.id == task_id).one_or_none()
+            if row is None and args['include_archived']:
+                row = db.session.query(*field_columns(ARCHIVED_TASK_FIELDS)).filter(
+                    ArchivedTask.id == task_id
+                ).one_or_none()
+            if row is None:
+                abort(404)
+            task = attach_dependency_ids([row], archived=args['include_archived'])[0]
+            if current_app.config['API_FAST_JSON']:
+                return json_response(task), version_headers(row)
+            return task, version_headers(row)
         task = Task.query.get_or_404(task_id)
-        return task
+        return task, version_headers(task)
 
     @blp.arguments(TaskSchema)
     @blp.response(200, TaskSchema)
     def put(self, update_data, task_id):
-        """Update a task"""
-        task = Task.query.get_or_404(task_id)
-        task.title = update_data.get('title', task.title)
-        task.description = update_data.get('description', task.description)
-        task.status = update_data.get('status', task.status)
-        task.due_date = update_data.get('due_date', task.due_date)
-
-        # Update dependencies
-        if 'dependencies' in update_data:
-            task.dependencies = []
-            for dependency_id in update_data['dependencies']:
-                dependency = Task.query.get(dependency_id)
-                if dependency:
-                    task.dependencies.append(dependency)
+        """Update a task
 
-        db.session.commit()
-        return task
+        Requires ``If-Match`` with the task's ETag: ``428`` without it,
+        ``412`` if the task changed since, ``409`` if a concurrent update
+        wins the race. Only the dependency edges that change are written.
+        """
+        task = Task.query.get_or_404(task_id)
+        require_if_match(task)
+        old_status = task.status
+
+        relinked = 'dependencies' in update_data
+        if relinked:
+            found = find_dependency_cycle({task.id: update_data['dependencies']})
+            if found:
+                abort(409, message=str(CycleError(found[1])))
+
+        with conflict_on_stale_version():
+            # Dependencies go first so that their version bump and the field
+            # changes below are written by a single UPDATE
+            if relinked:
+                relinked = set_dependencies(task, update_data['dependencies'])
+
+            task.title = update_data.get('title', task.title)
+            task.description = update_data.get('description', task.description)
+            task.status = update_data.get('status', task.status)
+            task.due_date = update_data.get('due_date', task.due_date)
+
+            refresh_open_dependency_counts(
+                task_ids=[task.id] if relinked else [],
+                dependency_ids=[task.id] if task.status != old_status else []
+            )
+            record_task_events(update_event(old_status, task.status), [task.id])
+            invalidate_tasks([task.id], [task.project_id])
+            db.session.commit()
+        return task, version_headers(task)
 
     @blp.response(204)
     def delete(self, task_id):
-        """Delete a task"""
+        """Delete a task
+
+        Requires ``If-Match`` like PUT.
+        """
         task = Task.query.get_or_404(task_id)
-        db.session.delete(task)
+        require_if_match(task)
+        claim_version(task)
+        delete_tasks([task.id], [task.project_id])
         db.session.commit()
         return '', 204
 
-# Register the blueprint
-api.register_blueprint(blp)
+@blp.route('/tasks/<int:task_id>/blockers')
+class TaskBlockers(MethodView):
+    @blp.response(200, BlockersSchema)
+    def get(self, task_id):
+        """Get the unfinished tasks a task transitively depends on, in any project"""
+        task = Task.query.get_or_404(task_id)
+        reachable = reachable_dependencies([task.id])
+        rows = db.session.execute(
+            select(reachable.c.task_id, reachable.c.dependency_id, Task.status, Task.due_date)
+            .join(Task, Task.id == reachable.c.dependency_id)
+        ).all()
+        nodes = {task.id: (task.id, task.status, task.due_date)}
+        nodes.update((dependency_id, (dependency_id, status, due_date)) for _, dependency_id, status, due_date in rows)
+        graph = DependencyGraph(nodes.values(), [(task_id, dependency_id) for task_id, dependency_id, _, _ in rows])
+        return {'blockers': graph.blockers(task.id)}
+
+@blp.route('/projects/<int:project_id>/graph/order')
+class ProjectTaskOrder(MethodView):
+    @blp.response(200, TaskOrderSchema)
+    def get(self, project_id):
+        """Get the project's task ids ordered so dependencies come first"""
+        Project.query.get_or_404(project_id)
+        try:
+            return {'order': load_dependency_graph([project_id]).topological_order()}
+        except CycleError as err:
+            abort(409, message=str(err))
+
+@blp.route('/projects/<int:project_id>/graph/critical-path')
+class ProjectCriticalPath(MethodView):
+    @blp.response(200, CriticalPathSchema)
+    def get(self, project_id):
+        """Get the dependency chain that determines the project's finish date"""
+        Project.query.get_or_404(project_id)
+        try:
+            tasks, finish_date = load_dependency_graph([project_id]).critical_path()
+        except CycleError as err:
+            abort(409, message=str(err))
+        return {'tasks': tasks, 'finish_date': finish_date}
+
+@blp.route('/templates/<int:template_id>/apply')
+class TemplateApply(MethodView):
+    @blp.arguments(TemplateApplySchema)
+    @blp.response(201, TemplateApplyResultSchema)
+    @blp.alt_response(202, schema=JobSchema)
+    def post(self, data, template_id):
+        """Apply a template to many projects at once
+
+        Due dates are offsets from ``start_date`` (today by default).
+        Returns the new task ids keyed by project id, or ``202`` with a
+        background job when more than ``API_ASYNC_THRESHOLD`` tasks would
+        be created.
+        """
+        plan = load_template_plan(template_id)
+        if plan is None:
+            abort(404, message='Template not found.')
+        project_ids = list(dict.fromkeys(data['project_ids']))
+        found = set(db.session.scalars(select(Project.id).where(Project.id.in_(project_ids))))
+        missing = [project_id for project_id in project_ids if project_id not in found]
+        if missing:
+            abort(404, message=f'Projects not found: {missing}')
+        if is_large_application(plan, project_ids):
+            start_date = data.get('start_date')
+            job = enqueue_job(
+                'apply_template', template_id=template_id, project_ids=project_ids,
+                start_date=start_date.isoformat() if start_date else None
+            )
+            db.session.commit()
+            return job_accepted(job)
+        created = apply_template_plan(plan, project_ids, data.get('start_date'))
+        db.session.commit()
+        return {'created': created}
+
+@blp.route('/jobs/<int:job_id>')
+class JobResource(MethodView):
+    @blp.response(200, JobSchema)
+    def get(self, job_id):
+        """Get the status of a background job"""
+        return Job.query.get_or_404(job_id)
+
+def run_search(query, types=('task', 'project'), limit=20, offset=0):
+    """Return up to limit ranked search results after skipping offset of them"""
+    words = search_terms(query)
+    if not words:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    try:
+        statement = search_statement(dialect, types)
+    except NotImplementedError as err:
+        abort(501, message=str(err))
+    return db.session.execute(statement, {
+        'match': match_expression(dialect, words),
+        'limit': limit,
+        'offset': offset,
+    }).mappings().all()
+
+@blp.route('/search')
+class Search(MethodView):
+    @blp.arguments(SearchArgsSchema, location='query')
+    @blp.response(200, SearchResultSchema(many=True))
+    def get(self, args):
+        """Search task titles and descriptions and project names and descriptions
+
+        Every word must match; the last one also matches as a prefix.
+        Results are ranked best first and paginated with ``limit`` and
+        ``offset``; a ``Link`` header points to the next page.
+        """
+        types = (args['type'],) if 'type' in args else ('task', 'project')
+        # One extra row tells whether there is a next page
+        results = run_search(args['q'], types, args['limit'] + 1, args['offset'])
+        if len(results) <= args['limit']:
+            return results
+        query = request.args.copy()
+        query['offset'] = args['offset'] + args['limit']
+        next_url = f"{request.base_url}?{urlencode(list(query.items(multi=True)))}"
+        return results[:args['limit']], {'Link': f'<{next_url}>; rel="next"'}
+
+# Export and import
+# A dataset is a stream of records: every project, then every task, then
+# every dependency edge. Records only refer to records earlier in the
+# stream, so an import can give each one a new id as it goes.
+EXPORT_COLUMNS = ('type', 'id', 'project_id', 'name', 'title', 'description', 'status', 'due_date',
+                  'task_id', 'dependency_id')
+
+def export_records(chunk_size):
+    """Yield every project, task and dependency edge as a dict, fetching chunk_size rows at a time.
+
+    The three queries share one transaction reading a single snapshot,
+    so writes made during a long export can't leave a task without its
+    project or an edge without its tasks.
+    """
+    queries = (
+        ('project', select(Project.id, Project.name, Project.description).order_by(Project.id)),
+        ('task', select(Task.id, Task.project_id, Task.title, Task.description, Task.status, Task.due_date)
+            .order_by(Task.id)),
+        ('dependency', select(task_dependencies.c.task_id, task_dependencies.c.dependency_id)),
+    )
+    sqlite = db.engine.dialect.name == 'sqlite'
+    options = {} if sqlite else {'isolation_level': 'REPEATABLE READ'}
+    with db.engine.connect().execution_options(**options) as connection:
+        if sqlite:
+            # pysqlite doesn't begin a transaction for reads by itself; in
+            # WAL mode an explicit one keeps the snapshot of its first read
+            connection.exec_driver_sql('BEGIN')
+        for record_type, query in queries:
+            # yield_per streams from a server-side cursor where the driver has one
+            result = connection.execute(query.execution_options(yield_per=chunk_size))
+            for row in result.mappings():
+                yield {'type': record_type, **row}
+
+def export_chunks(records, format, chunk_size):
+    """Encode records as NDJSON or CSV text, chunk_size records per chunk"""
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.DictWriter(buffer, EXPORT_COLUMNS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        write = lambda record: buffer.write(json.dumps(record, default=str) + '\n')
+    for count, record in enumerate(records, 1):
+        write(record)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def import_records(lines, format):
+    """Parse an exported stream line by line into record dicts"""
+    if format == 'csv':
+        for row in csv.DictReader(lines):
+            # CSV has no nulls: empty cells are missing values
+            yield {key: value for key, value in row.items() if value != ''}
+    else:
+        for line in lines:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    raise ValidationError('Not a JSON object.')
+                yield record
+
+class DatasetImport:
+    """Write imported records with chunked bulk inserts, giving each a new id"""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        # Exported id -> new id
+        self.project_ids = {}
+        self.task_ids = {}
+        self.projects, self.tasks, self.edges = [], [], []
+        # Both ends of every inserted edge, for the cycle check
+        self.edge_tasks, self.edge_dependencies = array('q'), array('q')
+        self.edge_count = 0
+        self.project_schema = ProjectSchema()
+        self.task_schema = TaskSchema(only=('title', 'description', 'status', 'due_date', 'project_id'))
+
+    @staticmethod
+    def record_id(record, key):
+        try:
+            return int(record[key])
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(f'"{key}" must be an integer.')
+
+    def add(self, record):
+        record_type = record.get('type')
+        if record_type == 'project':
+            data = self.project_schema.load({
+                key: record[key] for key in ('name', 'description') if record.get(key) is not None
+            })
+            self.projects.append((self.record_id(record, 'id'), data))
+            if len(self.projects) >= self.chunk_size:
+                self.flush_projects()
+        elif record_type == 'task':
+            self.flush_projects()
+            data = self.task_schema.load({
+                key: record[key] for key in ('title', 'description', 'status', 'due_date', 'project_id')
+                if record.get(key) is not None
+            })
+            if data['project_id'] not in self.project_ids:
+                raise ValidationError(f'Unknown project {data["project_id"]}.')
+            data['project_id'] = self.project_ids[data['project_id']]
+            self.tasks.append((self.record_id(record, 'id'), data))
+            if len(self.tasks) >= self.chunk_size:
+                self.flush_tasks()
+        elif record_type == 'dependency':
+            self.flush_tasks()
+            edge = []
+            for key in ('task_id', 'dependency_id'):
+                task_id = self.record_id(record, key)
+                if task_id not in self.task_ids:
+                    raise ValidationError(f'Unknown task {task_id}.')
+                edge.append(self.task_ids[task_id])
+            self.edges.append(tuple(edge))
+            if len(self.edges) >= self.chunk_size:
+                self.flush_edges()
+        else:
+            raise ValidationError('"type" must be project, task or dependency.')
+
+    def flush_projects(self):
+        if self.projects:
+            new_ids = db.session.scalars(
+                insert(Project).returning(Project.id, sort_by_parameter_order=True),
+                [data for _, data in self.projects]
+            ).all()
+            self.project_ids.update(zip((old_id for old_id, _ in self.projects), new_ids))
+            self.projects.clear()
+
+    def flush_tasks(self):
+        if self.tasks:
+            new_ids = db.session.scalars(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                [data for _, data in self.tasks]
+            ).all()
+            self.task_ids.update(zip((old_id for old_id, _ in self.tasks), new_ids))
+            record_task_events('created', new_ids)
+            self.tasks.clear()
+
+    def flush_edges(self):
+        if self.edges:
+            insert_dependency_edges(self.edges)
+            refresh_open_dependency_counts(task_ids={task_id for task_id, _ in self.edges})
+            self.edge_tasks.extend(task_id for task_id, _ in self.edges)
+            self.edge_dependencies.extend(dependency_id for _, dependency_id in self.edges)
+            self.edge_count += len(self.edges)
+            self.edges.clear()
+
+    def counts(self):
+        return {
+            'projects': len(self.project_ids),
+            'tasks': len(self.task_ids),
+            'dependencies': self.edge_count,
+        }
+
+    def finish(self):
+        """Flush what is left and return the cycle created by the import, if any.
+
+        Imported edges only join imported tasks, which nothing stored
+        depends on yet, so they are checked as one graph of their own.
+        """
+        self.flush_projects()
+        self.flush_tasks()
+        self.flush_edges()
+        if not self.edge_count:
+            return None
+        graph = DependencyGraph(
+            ((task_id, None, None) for task_id in self.task_ids.values()),
+            zip(self.edge_tasks, self.edge_dependencies),
+        )
+        return graph.find_cycle()
+
+class InvalidRecord(ValueError):
+    """Raised by import_dataset for a record that cannot be imported"""
+
+    def __init__(self, number, messages):
+        self.number = number
+        self.messages = messages
+        super().__init__(f'Invalid record {number}: {messages}')
+
+def import_dataset(lines, format):
+    """Import an exported stream into the current transaction, without committing.
+
+    Raises InvalidRecord, CycleError, or UnicodeDecodeError for a body
+    that isn't UTF-8.
+    """
+    dataset = DatasetImport(current_app.config['API_STREAM_CHUNK_SIZE'])
+    number = 1
+    try:
+        for record in import_records(lines, format):
+            dataset.add(record)
+            number += 1
+    except ValidationError as err:
+        raise InvalidRecord(number, err.messages)
+    cycle = dataset.finish()
+    if cycle:
+        raise CycleError(cycle)
+    # New projects have never been cached individually
+    invalidate_projects()
+    return dataset
+
+def remove_import_spool(path, format):
+    """Delete the spooled body of an import job that won't run again"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+@job_queue.handler('import', cleanup=remove_import_spool)
+def import_job(path, format):
+    try:
+        with open(path, encoding='utf-8', newline='') as lines:
+            dataset = import_dataset(lines, format)
+    except (InvalidRecord, CycleError, UnicodeDecodeError) as err:
+        raise JobError(str(err)) from err
+    db.session.commit()
+    return dataset.counts()
+
+@blp.route('/export')
+class Export(MethodView):
+    @blp.arguments(ExportArgsSchema, location='query')
+    def get(self, args):
+        """Stream every project, task and dependency as NDJSON or CSV
+
+        Records are written projects first, then tasks, then dependency
+        edges, each with a ``type`` field. The output can be fed back to
+        ``POST /import``.
+        """
+        chunk_size = current_app.config['API_STREAM_CHUNK_SIZE']
+        records = export_records(chunk_size)
+        if args['format'] == 'csv':
+            mimetype = 'text/csv'
+        else:
+            mimetype = 'application/x-ndjson'
+        return Response(
+            stream_with_context(export_chunks(records, args['format'], chunk_size)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=export.{args["format"]}'}
+        )
+
+@blp.route('/import')
+class Import(MethodView):
+    @blp.response(201, ImportResultSchema)
+    @blp.alt_response(202, schema=JobSchema)
+    def post(self):
+        """Import a stream written by GET /export
+
+        Send NDJSON, or CSV with ``Content-Type: text/csv``. The body is
+        read incrementally and written in chunked bulk inserts inside one
+        transaction; every record gets a new id and dependency edges are
+        remapped accordingly. Bodies over ``API_ASYNC_IMPORT_BYTES`` (or
+        without a length) are spooled to disk and imported by a
+        background job; the response is then ``202`` with the job.
+        """
+        format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        length = request.content_length
+        if length is None or length > current_app.config['API_ASYNC_IMPORT_BYTES']:
+            with tempfile.NamedTemporaryFile('wb', prefix='import-', suffix=f'.{format}', delete=False) as spool:
+                shutil.copyfileobj(request.stream, spool)
+            job = enqueue_job('import', path=spool.name, format=format)
+            db.session.commit()
+            return job_accepted(job)
+
+        lines = (line.decode('utf-8') for line in request.stream)
+        try:
+            dataset = import_dataset(lines, format)
+        except InvalidRecord as err:
+            db.session.rollback()
+            abort(422, message=f'Invalid record {err.number}.', errors=err.messages)
+        except UnicodeDecodeError:
+            db.session.rollback()
+            abort(400, message='The body must be UTF-8.')
+        except CycleError as err:
+            db.session.rollback()
+            abort(409, message=str(err))
+        db.session.commit()
+        return dataset.counts()
+
+def task_events_after(project_id, cursor, limit):
+    return db.session.execute(
+        select(TaskEvent.id, TaskEvent.type, TaskEvent.data)
+        .where(TaskEvent.project_id == project_id, TaskEvent.id > cursor)
+        .order_by(TaskEvent.id).limit(limit)
+    ).all()
+
+def project_event_stream(project_id, cursor=None):
+    """Yield a project's logged events after cursor, then new ones as they are published.
+
+    Without a cursor only new events are sent. The stream subscribes
+    before reading the log, so nothing committed in between is missed,
+    and ends after ``EVENT_STREAM_TIMEOUT`` seconds. A published event
+    only wakes the stream up to read the log again: writers may publish
+    in another order than they committed.
+    """
+    heartbeat = current_app.config['EVENT_HEARTBEAT']
+    deadline = time.monotonic() + current_app.config['EVENT_STREAM_TIMEOUT']
+    chunk_size = current_app.config['API_STREAM_CHUNK_SIZE']
+    subscription = event_broker.subscribe(f'project:{project_id}')
+    try:
+        if cursor is None:
+            cursor = db.session.scalar(select(func.max(TaskEvent.id))) or 0
+        catching_up = True
+        while True:
+            if catching_up:
+                while True:
+                    rows = task_events_after(project_id, cursor, chunk_size)
+                    for event_id, event_type, data in rows:
+                        yield format_event(event_id, event_type, data)
+                        cursor = event_id
+                    if len(rows) < chunk_size:
+                        break
+                # Don't hold a connection while waiting for events
+                db.session.close()
+                catching_up = False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                message = subscription.get(timeout=min(heartbeat, remaining))
+            except Overflow:
+                catching_up = True
+                continue
+            if message is None:
+                yield ': keep-alive\n\n'
+            elif message['id'] > cursor:
+                catching_up = True
+    finally:
+        subscription.close()
+
+@blp.route('/projects/<int:project_id>/events')
+class ProjectEvents(MethodView):
+    @blp.arguments(EventStreamArgsSchema, location='query')
+    def get(self, args, project_id):
+        """Stream the project's task changes as Server-Sent Events
+
+        Events are ``created``, ``updated``, ``completed`` and ``deleted``;
+        their data is the task as ``GET /tasks/<id>`` returns it (only
+        ``id`` and ``project_id`` for deletions) and their id is a
+        position in the change log. To catch up after a disconnect, pass
+        the last id received as ``since`` or in the ``Last-Event-ID``
+        header, which browsers send when they reconnect. Without either,
+        only new changes are sent. Idle streams get a comment every
+        ``EVENT_HEARTBEAT`` seconds.
+        """
+        Project.query.get_or_404(project_id)
+        cursor = args.get('since')
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        if last_event_id.isdigit():
+            cursor = int(last_event_id)
+        return Response(
+            stream_with_context(project_event_stream(project_id, cursor)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
 # Frontend Routes
-@app.route("/")
+frontend = FlaskBlueprint('frontend', __name__)
+
+# Stamps of the cached list items: everything an item is rendered from
+# that its own version doesn't cover
+@frontend.app_template_global()
+def project_fragment_stamp(project):
+    return project.version, project.summary
+
+@frontend.app_template_global()
+def task_fragment_stamp(task):
+    return task.version, [(dependency.id, dependency.version) for dependency in task.dependencies]
+
+@frontend.route("/")
+@replica_router.read_only
 def index():
     """Render the homepage with all projects"""
-    projects = Project.query.all()
+    projects = attach_summaries(Project.query.order_by(Project.id).all())
     return render_template("index.html", projects=projects)
 
-@app.route("/add_template", methods=["GET", "POST"])
+@frontend.route("/search_results")
+def search_results():
+    """Render the projects and tasks matching the search box"""
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    results = run_search(query, limit=per_page + 1, offset=(page - 1) * per_page)
+    return render_template(
+        "search_results.html", query=query, results=results[:per_page], page=page,
+        has_next=len(results) > per_page
+    )
+
+@frontend.route("/add_template", methods=["GET", "POST"])
 def add_template():
     """Add a new task template"""
     if request.method == "POST":
@@ -210,29 +2334,34 @@ def add_template():
         task_titles = request.form.getlist('task_title[]')
         task_descriptions = request.form.getlist('task_description[]')
         task_due_date_offsets = request.form.getlist('task_due_date_offset[]')
+        task_depends_on = request.form.getlist('task_depends_on[]')
 
-        # Create the template
+        # Create the template and its tasks in one transaction
         new_template = TaskTemplate(name=name, description=description)
-        db.session.add(new_template)
-        db.session.commit()
-
-        # Add tasks to the template
         for i in range(len(task_titles)):
             new_template_task = TemplateTask(
                 title=task_titles[i],
                 description=task_descriptions[i],
-                due_date_offset=int(task_due_date_offsets[i]),
-                template_id=new_template.id
+                due_date_offset=int(task_due_date_offsets[i])
             )
-            db.session.add(new_template_task)
+            new_template.tasks.append(new_template_task)
+
+            # Dependencies refer to earlier tasks by their 1-based position
+            depends_on = task_depends_on[i] if i < len(task_depends_on) else ''
+            for position in filter(None, (part.strip() for part in depends_on.split(','))):
+                if not position.isdigit() or not 1 <= int(position) <= i:
+                    flash(f'Task {i + 1} can only depend on earlier tasks (1 to {i}).', 'error')
+                    return render_template("add_template.html")
+                new_template_task.dependencies.append(new_template.tasks[int(position) - 1])
 
+        db.session.add(new_template)
         db.session.commit()
         flash('Template created successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('frontend.index'))
 
     return render_template("add_template.html")
 
-@app.route("/apply_template/<int:project_id>", methods=["GET", "POST"])
+@frontend.route("/apply_template/<int:project_id>", methods=["GET", "POST"])
 def apply_template(project_id):
     """Apply a task template to a project"""
     project = Project.query.get_or_404(project_id)
@@ -240,27 +2369,24 @@ def apply_template(project_id):
 
     if request.method == "POST":
         template_id = request.form['template_id']
-        template = TaskTemplate.query.get_or_404(template_id)
+        plan = load_template_plan(int(template_id))
+        if plan is None:
+            abort(404)
 
         # Create tasks based on the template
-        for template_task in template.tasks:
-            due_date = (datetime.utcnow() + timedelta(days=template_task.due_date_offset)).date()
-            new_task = Task(
-                title=template_task.title,
-                description=template_task.description,
-                status=template_task.status,
-                due_date=due_date,
-                project_id=project_id
-            )
-            db.session.add(new_task)
-
+        if is_large_application(plan, [project_id]):
+            enqueue_job('apply_template', template_id=int(template_id), project_ids=[project_id])
+            db.session.commit()
+            flash('The template is being applied in the background.', 'success')
+            return redirect(url_for('frontend.project_detail', project_id=project_id))
+        apply_template_plan(plan, [project_id])
         db.session.commit()
         flash('Template applied successfully!', 'success')
-        return redirect(url_for('project_detail', project_id=project_id))
+        return redirect(url_for('frontend.project_detail', project_id=project_id))
 
     return render_template("apply_template.html", project_id=project_id, templates=templates)
 
-@app.route("/add_project", methods=["GET", "POST"])
+@frontend.route("/add_project", methods=["GET", "POST"])
 def add_project():
     """Add a new project"""
     if request.method == "POST":
@@ -268,12 +2394,13 @@ def add_project():
         description = request.form['description']
         new_project = Project(name=name, description=description)
         db.session.add(new_project)
+        invalidate_projects()
         db.session.commit()
         flash('Project added successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('frontend.index'))
     return render_template("add_project.html")
 
-@app.route("/add_project_with_tasks", methods=["GET", "POST"])
+@frontend.route("/add_project_with_tasks", methods=["GET", "POST"])
 def add_project_with_tasks():
     """Add a new project with tasks"""
     if request.method == "POST":
@@ -282,6 +2409,7 @@ def add_project_with_tasks():
 
         new_project = Project(name=name, description=description)
         db.session.add(new_project)
+        invalidate_projects()
         db.session.commit()
 
         task_titles = request.form.getlist('task_title[]')
@@ -289,6 +2417,7 @@ def add_project_with_tasks():
         task_statuses = request.form.getlist('task_status[]')
         task_due_dates = request.form.getlist('task_due_date[]')
 
+        new_tasks = []
         for i in range(len(task_titles)):
             due_date = None
             if task_due_dates[i]:
@@ -306,14 +2435,18 @@ def add_project_with_tasks():
                 project_id=new_project.id
             )
             db.session.add(new_task)
+            new_tasks.append(new_task)
 
+        db.session.flush()
+        record_task_events('created', [task.id for task in new_tasks])
+        invalidate_tasks(project_ids=[new_project.id])
         db.session.commit()
         flash('Project and tasks added successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('frontend.index'))
 
     return render_template("add_project_with_tasks.html")
 
-@app.route("/add_task/<int:project_id>", methods=["GET", "POST"])
+@frontend.route("/add_task/<int:project_id>", methods=["GET", "POST"])
 def add_task(project_id):
     """Add a new task to a project"""
     project = Project.query.get_or_404(project_id)
@@ -333,7 +2466,7 @@ def add_task(project_id):
                 due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
             except ValueError:
                 flash('Invalid date format. Please use YYYY-MM-DD.', 'error')
-                return redirect(url_for('add_task', project_id=project_id))
+                return redirect(url_for('frontend.add_task', project_id=project_id))
         else:
             # Use the default due date (2 days from now)
             due_date = (datetime.utcnow() + timedelta(days=2)).date()
@@ -347,27 +2480,52 @@ def add_task(project_id):
             project_id=project_id
         )
         db.session.add(new_task)
+        invalidate_tasks(project_ids=[project_id])
         db.session.commit()
 
         # Add dependencies
-        for dependency_id in dependencies:
-            dependency = Task.query.get(dependency_id)
-            if dependency:
-                new_task.dependencies.append(dependency)
+        new_task.dependencies = load_dependencies(dependencies)
+        refresh_open_dependency_counts(task_ids=[new_task.id])
 
+        record_task_events('created', [new_task.id])
+        invalidate_tasks([new_task.id], [project_id])
         db.session.commit()
         flash('Task added successfully!', 'success')
-        return redirect(url_for('project_detail', project_id=project_id))
+        return redirect(url_for('frontend.project_detail', project_id=project_id))
 
     return render_template("add_task.html", project_id=project_id, tasks=tasks)
 
-@app.route("/project_detail/<int:project_id>")
+@frontend.route("/project_detail/<int:project_id>")
+@replica_router.read_only
 def project_detail(project_id):
     """Render the project detail page with tasks"""
-    project = Project.query.get_or_404(project_id)
-    return render_template("project_detail.html", project=project)
+    filters = {
+        'status': request.args.get('status', ''),
+        'due_after': request.args.get('due_after', ''),
+        'due_before': request.args.get('due_before', ''),
+        'sort': request.args.get('sort', 'id'),
+    }
+    due_dates = {}
+    for name in ('due_after', 'due_before'):
+        if filters[name]:
+            try:
+                due_dates[name] = datetime.strptime(filters[name], '%Y-%m-%d').date()
+            except ValueError:
+                flash('Invalid date format. Please use YYYY-MM-DD.', 'error')
+    if filters['sort'] not in TASK_SORTS:
+        filters['sort'] = 'id'
+
+    criteria = task_filter_criteria(
+        [filters['status']] if filters['status'] else None,
+        due_dates.get('due_after'), due_dates.get('due_before')
+    )
+    sort_column, descending = TASK_SORTS[filters['sort']]
+    project, tasks = load_project_with_task_graph(
+        project_id, criteria, sort_order(Task, sort_column, descending)
+    )
+    return render_template("project_detail.html", project=project, tasks=tasks, filters=filters)
 
-@app.route("/edit_task/<int:task_id>", methods=["GET", "POST"])
+@frontend.route("/edit_task/<int:task_id>", methods=["GET", "POST"])
 def edit_task(task_id):
     """Edit an existing task"""
     task = Task.query.get_or_404(task_id)
@@ -375,97 +2533,282 @@ def edit_task(task_id):
     tasks = Task.query.filter_by(project_id=project.id).all()
 
     if request.method == "POST":
-        task.title = request.form['title']
-        task.description = request.form['description']
-        task.status = request.form['status']
+        if request.form.get('version', type=int) not in (None, task.version):
+            flash(f'Task "{task.title}" was changed by someone else. Review the changes and try again.', 'error')
+            return redirect(url_for('frontend.edit_task', task_id=task_id))
+        old_status = task.status
         due_date_str = request.form['due_date']
         dependencies = request.form.getlist('dependencies[]')
 
         # Convert due_date_str to a date object (or None if empty)
+        due_date = task.due_date
         if due_date_str:
             try:
-                task.due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
+                due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
             except ValueError:
                 flash('Invalid date format. Please use YYYY-MM-DD.', 'error')
-                return redirect(url_for('edit_task', task_id=task_id))
-
-        # Update dependencies
-        task.dependencies = []
-        for dependency_id in dependencies:
-            dependency = Task.query.get(dependency_id)
-            if dependency:
-                task.dependencies.append(dependency)
+                return redirect(url_for('frontend.edit_task', task_id=task_id))
+
+        found = find_dependency_cycle({task.id: dependencies})
+        if found:
+            flash(f'Cannot update task "{task.title}": {str(CycleError(found[1]))}.', 'error')
+            return redirect(url_for('frontend.edit_task', task_id=task_id))
+
+        # Flushes before the commit can find a concurrent change as well
+        try:
+            # Update dependencies first so that their version bump and the
+            # field changes below are written by a single UPDATE
+            relinked = set_dependencies(task, dependencies)
+
+            task.title = request.form['title']
+            task.description = request.form['description']
+            task.status = request.form['status']
+            task.due_date = due_date
+            refresh_open_dependency_counts(
+                task_ids=[task.id] if relinked else [],
+                dependency_ids=[task.id] if task.status != old_status else []
+            )
 
-        db.session.commit()
+            record_task_events(update_event(old_status, task.status), [task.id])
+            invalidate_tasks([task.id], [task.project_id])
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            flash(f'Task "{task.title}" was changed by someone else. Review the changes and try again.', 'error')
+            return redirect(url_for('frontend.edit_task', task_id=task_id))
         flash('Task updated successfully!', 'success')
-        return redirect(url_for('project_detail', project_id=task.project_id))
+        return redirect(url_for('frontend.project_detail', project_id=task.project_id))
 
     return render_template("edit_task.html", task=task, tasks=tasks)
 
-@app.route("/delete_task/<int:task_id>", methods=["POST"])
+@frontend.route("/delete_task/<int:task_id>", methods=["POST"])
 def delete_task(task_id):
     """Delete a task"""
     task = Task.query.get_or_404(task_id)
     project_id = task.project_id
 
-    # Remove the task from the dependencies of other tasks
-    for dependent_task in task.dependents:
-        dependent_task.dependencies.remove(task)
-
-    # Delete the task
-    db.session.delete(task)
+    # Delete the task and remove it from the dependencies of other tasks
+    delete_tasks([task.id], [project_id])
     db.session.commit()
 
     flash('Task deleted successfully!', 'success')
-    return redirect(url_for('project_detail', project_id=project_id))
+    return redirect(url_for('frontend.project_detail', project_id=project_id))
 
-@app.route("/complete_task/<int:task_id>", methods=["POST"])
+@frontend.route("/complete_task/<int:task_id>", methods=["POST"])
 def complete_task(task_id):
     """Mark a task as complete"""
     task = Task.query.get_or_404(task_id)
     project = Project.query.get_or_404(task.project_id)
 
     # Check if all dependencies are completed
-    for dependency in task.dependencies:
-        if dependency.status != 'Done':
-            flash(f'Cannot complete task "{task.title}" because dependency "{dependency.title}" is not done.', 'error')
-            return redirect(url_for('project_detail', project_id=task.project_id))
-
-    task.status = "Done"
-    db.session.commit()
+    dependency = Task.query.join(
+        task_dependencies, task_dependencies.c.dependency_id == Task.id
+    ).filter(
+        task_dependencies.c.task_id == task.id,
+        func.coalesce(Task.status, '') != 'Done'
+    ).first()
+    if dependency:
+        flash(f'Cannot complete task "{task.title}" because dependency "{dependency.title}" is not done.', 'error')
+        return redirect(url_for('frontend.project_detail', project_id=task.project_id))
+
+    old_status = task.status
+    # Flushes before the commit can find a concurrent change as well
+    try:
+        task.status = "Done"
+        refresh_open_dependency_counts(dependency_ids=[task.id])
+        record_task_events(update_event(old_status, task.status), [task.id])
+        invalidate_tasks([task.id], [task.project_id])
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        flash('The task was changed by someone else. Please try again.', 'error')
+        return redirect(url_for('frontend.project_detail', project_id=project.id))
     flash('Task marked as done!', 'success')
-    return redirect(url_for('project_detail', project_id=task.project_id))
+    return redirect(url_for('frontend.project_detail', project_id=task.project_id))
 
-@app.route("/edit_project/<int:project_id>", methods=["GET", "POST"])
+@frontend.route("/edit_project/<int:project_id>", methods=["GET", "POST"])
 def edit_project(project_id):
     """Edit an existing project"""
     project = Project.query.get_or_404(project_id)
 
     if request.method == "POST":
+        if request.form.get('version', type=int) not in (None, project.version):
+            flash(f'Project "{project.name}" was changed by someone else. Review the changes and try again.', 'error')
+            return redirect(url_for('frontend.edit_project', project_id=project_id))
         project.name = request.form['name']
         project.description = request.form['description']
-        db.session.commit()
+        invalidate_projects([project.id])
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            flash('The project was changed by someone else. Review the changes and try again.', 'error')
+            return redirect(url_for('frontend.edit_project', project_id=project_id))
         flash('Project updated successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('frontend.index'))
 
     return render_template("edit_project.html", project=project)
 
-@app.route("/delete_project/<int:project_id>", methods=["POST"])
+@frontend.route("/delete_project/<int:project_id>", methods=["POST"])
 def delete_project(project_id):
     """Delete a project"""
-    project = Project.query.get_or_404(project_id)
-    db.session.delete(project)
+    Project.query.get_or_404(project_id)
+    if project_task_count(project_id) > current_app.config['API_ASYNC_THRESHOLD']:
+        enqueue_job('delete_project', project_id=project_id)
+        db.session.commit()
+        flash('The project is being deleted in the background.', 'success')
+        return redirect(url_for('frontend.index'))
+    delete_project_rows(project_id)
     db.session.commit()
     flash('Project deleted successfully!', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('frontend.index'))
+
+# CLI commands, registered at the top level of the flask command
+commands = FlaskBlueprint('commands', __name__, cli_group=None)
 
-# CLI command to initialize the database
-@app.cli.command("init-db")
+@commands.cli.command("init-db")
 def init_db():
     """Initialize the database."""
     db.create_all()
     print("Database initialized.")
 
-# Run the app
+@commands.cli.command("rebuild-ready-counts")
+@click.option('--check', is_flag=True, help="Only report tasks whose stored count is wrong.")
+def rebuild_ready_counts(check):
+    """Recompute every task's open dependency count from scratch."""
+    table = Task.__table__
+    expected = open_dependency_count_query(table)
+    stale = db.session.execute(
+        select(table.c.id, table.c.open_dependency_count, expected.label('expected'))
+        .where(table.c.open_dependency_count != expected)
+    ).all()
+    for task_id, stored, correct in stale:
+        print(f"Task {task_id}: stored {stored}, expected {correct}")
+    if check:
+        print(f"{len(stale)} task(s) with a wrong count.")
+        if stale:
+            raise SystemExit(1)
+        return
+    db.session.execute(update(table).values(open_dependency_count=expected))
+    db.session.commit()
+    print(f"Ready counts rebuilt ({len(stale)} corrected).")
+
+@commands.cli.command("rebuild-search-index")
+def rebuild_search_index():
+    """Re-index every project and task for full-text search."""
+    statements = rebuild_statements(db.engine.dialect.name)
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+    if statements:
+        print("Search index rebuilt.")
+    else:
+        print("The search index of this database is always up to date.")
+
+@commands.cli.command("resume-jobs")
+def resume_jobs():
+    """Run the jobs left queued or running by a stopped server."""
+    job_ids = db.session.scalars(
+        select(Job.id).where(Job.status.in_(['queued', 'running'])).order_by(Job.id)
+    ).all()
+    for job_id in job_ids:
+        job_queue.run(job_id)
+        job = db.session.get(Job, job_id)
+        print(f"Job {job_id} ({job.name}): {job.status}")
+    print(f"{len(job_ids)} job(s) resumed.")
+
+@commands.cli.command("prune-task-events")
+@click.option('--days', default=7, show_default=True, help="Keep the events of the last DAYS days.")
+def prune_task_events(days):
+    """Delete old entries from the task change log."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = db.session.execute(delete(TaskEvent).where(TaskEvent.created_at < cutoff)).rowcount
+    db.session.commit()
+    print(f"{deleted} event(s) older than {days} day(s) deleted.")
+
+@commands.cli.command("archive-tasks")
+@click.option('--days', type=int, help="Archive tasks done more than DAYS days ago [default: TASK_ARCHIVE_AFTER_DAYS].")
+def archive_tasks(days):
+    """Move old completed tasks to the archive."""
+    if days is None:
+        days = current_app.config['TASK_ARCHIVE_AFTER_DAYS']
+    count = archive_completed_tasks(days, current_app.config['TASK_ARCHIVE_CHUNK_SIZE'])
+    print(f"{count} task(s) done more than {days} day(s) ago archived.")
+
+@commands.cli.command("sync-replicas")
+def sync_replicas():
+    """Copy the SQLite database over its SQLite replicas."""
+    primary = db.engines[None].url
+    if primary.get_backend_name() != 'sqlite':
+        raise click.ClickException('The primary is not SQLite; its replicas are kept up to date by the database server.')
+    for key in replica_router.binds:
+        replica = db.engines[key]
+        if replica.url.get_backend_name() != 'sqlite':
+            print(f"{key}: skipped, not an SQLite database.")
+            continue
+        # Connections to the old copy would keep reading it
+        replica.dispose()
+        copy_sqlite_database(primary.database, replica.url.database)
+        print(f"{key}: copied to {replica.url.database}.")
+
+@commands.cli.command("precompress-static")
+def precompress_static():
+    """Write brotli and gzip versions of the static files next to them."""
+    written = precompress(
+        current_app.static_folder, current_app.config['COMPRESS_MIMETYPES'], current_app.config['COMPRESS_MIN_SIZE']
+    )
+    for path in written:
+        print(os.path.relpath(path, current_app.static_folder))
+    print(f"{len(written)} file(s) written.")
+
+def warn_about_process_local_state(app):
+    """Warn when several worker processes would each keep their own cache and event broker"""
+    workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    local = [name for name in ('RESPONSE_CACHE_URL', 'EVENT_BROKER_URL') if not app.config[name]]
+    if workers > 1 and local:
+        app.logger.warning(
+            '%s worker processes without %s: each worker only sees the cache invalidations and '
+            'task events of its own writes, so workers serve stale data for up to RESPONSE_CACHE_TTL seconds',
+            workers, ' or '.join(local),
+        )
+
+def create_app(config=None):
+    """Create and configure the application.
+
+    ``config`` overrides the defaults of Config. The database URL, the
+    replica URLs and pool settings come from the environment unless it
+    sets ``SQLALCHEMY_DATABASE_URI``/``SQLALCHEMY_BINDS``/``SQLALCHEMY_ENGINE_OPTIONS``.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds())
+
+    db.init_app(app)
+    with app.app_context():
+        set_pragmas = sqlite_pragmas(app.config['SQLITE_BUSY_TIMEOUT'])
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', set_pragmas)
+    replica_router.init_app(app)
+    migrate.init_app(app, db)
+    api.init_app(app)
+    response_cache.init_app(app)
+    fragment_cache.init_app(app)
+    response_compression.init_app(app)
+    static_assets.init_app(app)
+    metrics.init_app(app)
+    job_queue.init_app(app)
+    event_broker.init_app(app)
+
+    api.register_blueprint(blp)
+    app.register_blueprint(frontend)
+    app.register_blueprint(commands)
+    warn_about_process_local_state(app)
+    return app
+
+# Run the development server
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
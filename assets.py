@@ -0,0 +1,134 @@
+"""Fingerprinted, long-cached static files.
+
+``url_for('static', filename=...)`` adds a ``v`` query argument holding
+a hash of the file's contents. Requests whose ``v`` matches the file as
+it is now may be cached for a year without revalidation, since a
+changed file gets a new URL. Files precompressed by ``precompress()``
+(``main.css.br``, ``main.css.gz``) are served to clients that accept
+the coding; other static files are compressed like any response.
+"""
+import hashlib
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+from compression import SUFFIXES, codings, compress
+
+
+def file_hash(path):
+    """Short hash of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def is_fresh(path, source):
+    """Whether path exists and is at least as new as source"""
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except OSError:
+        return False
+
+
+def precompress(folder, types, min_size=0):
+    """Write a .br (with brotli installed) and a .gz file next to every
+    file of the given content types under folder; return the paths written"""
+    written = []
+    for directory, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if filename.endswith(tuple(SUFFIXES.values())) or mimetypes.guess_type(filename)[0] not in types:
+                continue
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) < min_size:
+                continue
+            for coding in codings():
+                target = path + SUFFIXES[coding]
+                with open(target, 'wb') as file:
+                    file.write(compress(data, coding))
+                written.append(target)
+    return written
+
+
+class StaticAssets:
+    """Flask extension fingerprinting static URLs and serving them with
+    long-lived cache headers and precompressed variants.
+
+    Configuration:
+
+    - ``STATIC_FINGERPRINT``: add the content hash to static URLs (default on)
+    - ``STATIC_MAX_AGE``: seconds a fingerprinted file may be cached
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.hashes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_FINGERPRINT', True)
+        app.config.setdefault('STATIC_MAX_AGE', 365 * 24 * 3600)
+        self.enabled = app.config['STATIC_FINGERPRINT']
+        self.max_age = app.config['STATIC_MAX_AGE']
+        app.url_defaults(self._add_fingerprint)
+        app.view_functions['static'] = self.send_static
+        app.extensions['static_assets'] = self
+
+    def fingerprint(self, filename):
+        """Hash of a static file, recomputed only when the file changes; None if it doesn't exist"""
+        path = safe_join(current_app.static_folder, filename)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        if stat is None:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = self.hashes[path] = (stamp, file_hash(path))
+        return cached[1]
+
+    def _add_fingerprint(self, endpoint, values):
+        if endpoint == 'static' and self.enabled and 'v' not in values:
+            version = self.fingerprint(values.get('filename', ''))
+            if version:
+                values['v'] = version
+
+    def send_static(self, filename):
+        """The static view: a precompressed variant when there is one for
+        the client, immutable caching when the URL names the current version"""
+        folder = current_app.static_folder
+        source = safe_join(folder, filename)
+        available = [
+            coding for coding in codings()
+            if source and is_fresh(source + SUFFIXES[coding], source)
+        ]
+        coding = request.accept_encodings.best_match(available)
+        if coding is not None:
+            response = send_from_directory(
+                folder, filename + SUFFIXES[coding], mimetype=mimetypes.guess_type(filename)[0]
+            )
+            response.headers['Content-Encoding'] = coding
+        else:
+            response = current_app.send_static_file(filename)
+            if response.mimetype in current_app.config['COMPRESS_MIMETYPES']:
+                # Read into memory so that the response can be compressed on the fly
+                response.direct_passthrough = False
+                response.set_data(response.get_data())
+        if available:
+            response.vary.add('Accept-Encoding')
+
+        version = request.args.get('v')
+        if self.enabled and version and version == self.fingerprint(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        return response
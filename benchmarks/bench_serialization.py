@@ -0,0 +1,71 @@
+"""Compare the marshmallow and row-based (``API_FAST_JSON``) API responses.
+
+Builds a throwaway SQLite database, then times the list and detail
+endpoints through the test client with the response cache disabled,
+once per serialization mode, checking that both return the same JSON.
+
+    python benchmarks/bench_serialization.py --projects 20 --tasks 500 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--projects', type=int, default=20, help='projects to create')
+    parser.add_argument('--tasks', type=int, default=500, help='tasks per project')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per endpoint and mode')
+    return parser.parse_args()
+
+
+def time_requests(client, url, repeat):
+    """Milliseconds per request, and the last response body"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return timings, response.get_json()
+
+
+def main():
+    args = parse_args()
+    directory = tempfile.mkdtemp(prefix='task-flask-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    sys.path.insert(0, ROOT)
+    from app import create_app, db, response_cache
+    from datagen import generate
+    import serialization
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        generate(args.projects, args.tasks, dependency_density=2.0)
+    response_cache.enabled = False
+    client = app.test_client()
+
+    encoder = 'orjson' if serialization.orjson is not None else 'json'
+    print(f'{args.projects} projects x {args.tasks} tasks, {args.repeat} requests each, encoder: {encoder}')
+    print(f"{'endpoint':<32}{'marshmallow ms':>16}{'fast ms':>10}{'speedup':>9}")
+    for url in ['/projects', '/projects?include=summary', '/projects/1/tasks', '/projects/1/tasks?limit=100',
+                '/projects/1/tasks?ready=true', '/tasks/2']:
+        medians, bodies = [], []
+        for fast in (False, True):
+            app.config['API_FAST_JSON'] = fast
+            timings, body = time_requests(client, url, args.repeat)
+            medians.append(statistics.median(timings))
+            bodies.append(body)
+        if bodies[0] != bodies[1]:
+            raise SystemExit(f'{url}: the two modes returned different responses')
+        print(f'{url:<32}{medians[0]:>16.2f}{medians[1]:>10.2f}{medians[0] / medians[1]:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
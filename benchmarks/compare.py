@@ -0,0 +1,68 @@
+"""Compare two result files written by ``run.py --output``.
+
+    python benchmarks/compare.py baseline.json results.json --threshold 10
+
+Prints the latency percentiles and statement counts of every scenario
+in both runs. Exits with status 1 when a scenario's p95 latency grew by
+more than ``--threshold`` percent or it runs more statements per
+request than before.
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def change(before, after):
+    """Relative change in percent; None when there is no baseline"""
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def describe(run):
+    dataset, settings = run['dataset'], run['settings']
+    return (f"{run.get('commit') or 'unknown commit'} ({run['created']}, {run['database']}): "
+            f"{dataset['tasks']} tasks, {settings['requests']} requests x {settings['threads']} thread(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed p95 slowdown in percent')
+    args = parser.parse_args()
+    baseline, current = load(args.baseline), load(args.current)
+
+    print(f'baseline: {describe(baseline)}')
+    print(f'current:  {describe(current)}')
+    if baseline['dataset'] != current['dataset'] or baseline['settings'] != current['settings']:
+        print('Warning: the runs used different datasets or settings.')
+    print(f"{'scenario':<16}{'p50 ms':>18}{'p95 ms':>18}{'change':>9}{'SQL max':>10}")
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            print(f'{name:<16}(not in baseline)')
+            continue
+        p50 = f"{before['latency_ms']['p50']:.2f} -> {result['latency_ms']['p50']:.2f}"
+        p95 = f"{before['latency_ms']['p95']:.2f} -> {result['latency_ms']['p95']:.2f}"
+        slowdown = change(before['latency_ms']['p95'], result['latency_ms']['p95'])
+        statements = f"{before['statements']['max']} -> {result['statements']['max']}"
+        print(f"{name:<16}{p50:>18}{p95:>18}{'' if slowdown is None else f'{slowdown:+.1f}%':>9}{statements:>10}")
+        if slowdown is not None and slowdown > args.threshold:
+            regressions.append(f'{name}: p95 latency {slowdown:+.1f}%')
+        if result['statements']['max'] > before['statements']['max']:
+            regressions.append(f"{name}: {statements} statements per request")
+
+    for message in regressions:
+        print(f'Regression: {message}')
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Synthetic data for the benchmarks.
+
+``generate()`` fills an empty database with projects, tasks, dependency
+edges and templates through bulk Core inserts. The data depends only on
+the parameters and the seed, so runs on different commits measure the
+same workload. Must be called inside an application context, with
+``app.py`` importable.
+"""
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert, update
+
+OPEN_STATUSES = ['To Do', 'In Progress']
+
+
+def dependency_count(rng, density, earlier):
+    """Number of dependencies for a task: ``density`` on average, at most ``earlier``"""
+    whole = int(density)
+    count = whole + (1 if rng.random() < density - whole else 0)
+    return min(count, earlier)
+
+
+def generate(projects=20, tasks=200, dependency_density=1.0, templates=5, template_tasks=10, seed=0):
+    """Insert a synthetic dataset and return what was created.
+
+    Every project gets ``tasks`` tasks. Each task depends on
+    ``dependency_density`` earlier tasks of its project on average, so
+    the graph is acyclic. A random share of each project's first tasks
+    is done, which leaves a mix of ready and blocked open tasks. About a
+    fifth of the tasks have no due date.
+    Templates have ``template_tasks`` tasks, each depending on the
+    previous one with probability ``dependency_density`` (capped at 1).
+    """
+    from app import (
+        Project, Task, TaskTemplate, TemplateTask, db, open_dependency_count_query,
+        task_dependencies, template_task_dependencies,
+    )
+
+    rng = random.Random(seed)
+    today = date.today()
+    project_ids = db.session.scalars(
+        insert(Project).returning(Project.id, sort_by_parameter_order=True),
+        [{'name': f'Project {number}', 'description': f'Synthetic project {number}'} for number in range(projects)],
+    ).all()
+
+    edge_count = 0
+    for project_id in project_ids:
+        rows, dependencies = [], []
+        # Dependencies always come earlier, so the done tasks never wait on open ones
+        done = int(tasks * rng.random())
+        for number in range(tasks):
+            picked = rng.sample(range(number), dependency_count(rng, dependency_density, number))
+            dependencies.append(picked)
+            rows.append({
+                'title': f'Task {number} of project {project_id}',
+                'description': f'Synthetic task {number}',
+                'status': 'Done' if number < done else rng.choice(OPEN_STATUSES),
+                'due_date': today + timedelta(days=rng.randint(-10, 30)) if rng.random() < 0.8 else None,
+                'project_id': project_id,
+            })
+        task_ids = db.session.scalars(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows).all()
+        edges = [
+            {'task_id': task_ids[number], 'dependency_id': task_ids[index]}
+            for number, picked in enumerate(dependencies) for index in picked
+        ]
+        if edges:
+            db.session.execute(insert(task_dependencies), edges)
+        edge_count += len(edges)
+
+    table = Task.__table__
+    db.session.execute(update(table).values(open_dependency_count=open_dependency_count_query(table)))
+
+    template_ids = db.session.scalars(
+        insert(TaskTemplate).returning(TaskTemplate.id, sort_by_parameter_order=True),
+        [{'name': f'Template {number}', 'description': f'Synthetic template {number}'} for number in range(templates)],
+    ).all()
+    for template_id in template_ids:
+        step_ids = db.session.scalars(
+            insert(TemplateTask).returning(TemplateTask.id, sort_by_parameter_order=True),
+            [
+                {'title': f'Step {number}', 'description': 'Synthetic step', 'status': 'To Do',
+                 'due_date_offset': number, 'template_id': template_id}
+                for number in range(template_tasks)
+            ],
+        ).all()
+        edges = [
+            {'template_task_id': step_id, 'dependency_id': previous}
+            for previous, step_id in zip(step_ids, step_ids[1:]) if rng.random() < dependency_density
+        ]
+        if edges:
+            db.session.execute(insert(template_task_dependencies), edges)
+    db.session.commit()
+
+    return {
+        'projects': len(project_ids),
+        'tasks': len(project_ids) * tasks,
+        'dependencies': edge_count,
+        'templates': len(template_ids),
+        'template_tasks': len(template_ids) * template_tasks,
+    }
@@ -0,0 +1,286 @@
+"""Benchmark the hot HTTP paths against a synthetic dataset.
+
+Generates a dataset (see datagen.py) in a throwaway SQLite database, or
+in the empty database named by ``--database-url``. Each scenario then
+sends requests through Flask's test client and records latency
+percentiles and the SQL statements every request ran. The response
+cache is off unless ``--response-cache`` is given, so the figures
+reflect the work behind each request. ``--replicas N`` serves the
+read-only views from N SQLite copies of the generated database.
+
+    python benchmarks/run.py --tasks 500 --requests 100 --output results.json
+    python benchmarks/compare.py baseline.json results.json
+
+``--check`` fails when a scenario runs more statements per request than
+its bound. Apart from selectinload's batches of 500 ids, the bounds do
+not depend on the dataset size, so exceeding one usually means a query
+now runs once per row.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Fixture:
+    """Ids of the generated rows that scenarios pick their targets from"""
+
+    def __init__(self):
+        from app import Project, Task, TaskTemplate, db
+
+        self.project_ids = db.session.scalars(db.select(Project.id).order_by(Project.id)).all()
+        self.template_ids = db.session.scalars(db.select(TaskTemplate.id).order_by(TaskTemplate.id)).all()
+        self.task_ids = {}
+        for task_id, project_id in db.session.execute(db.select(Task.id, Task.project_id).order_by(Task.id)):
+            self.task_ids.setdefault(project_id, []).append(task_id)
+        # Unfinished tasks whose dependencies are all done can be completed, once each
+        self.ready_task_ids = db.session.scalars(
+            db.select(Task.id).where(Task.open_dependency_count == 0, Task.status != 'Done').order_by(Task.id)
+        ).all()
+
+    def project_id(self, number):
+        return self.project_ids[number % len(self.project_ids)]
+
+
+# Each scenario maps a request number to (method, url, client keyword
+# arguments). Requests must not depend on each other's results.
+def index(fixture, number):
+    return 'GET', '/', {}
+
+
+def project_detail(fixture, number):
+    return 'GET', f'/project_detail/{fixture.project_id(number)}', {}
+
+
+def task_list(fixture, number):
+    return 'GET', f'/projects/{fixture.project_id(number)}/tasks', {}
+
+
+def task_create(fixture, number):
+    project_id = fixture.project_id(number)
+    task_ids = fixture.task_ids.get(project_id, [])
+    dependencies = task_ids[number % 7::max(len(task_ids) // 3, 1)][:3]
+    return 'POST', f'/projects/{project_id}/tasks', {'json': {
+        'title': f'Benchmark task {number}', 'description': 'Created by the benchmark',
+        'status': 'To Do', 'due_date': '2030-01-01', 'project_id': project_id, 'dependencies': dependencies,
+    }}
+
+
+def apply_template(fixture, number):
+    template_id = fixture.template_ids[number % len(fixture.template_ids)]
+    return 'POST', f'/apply_template/{fixture.project_id(number)}', {'data': {'template_id': template_id}}
+
+
+def complete_task(fixture, number):
+    if number >= len(fixture.ready_task_ids):
+        raise SystemExit('Not enough ready tasks for complete_task; generate more tasks or send fewer requests.')
+    return 'POST', f'/complete_task/{fixture.ready_task_ids[number]}', {}
+
+
+def selectin_batches(rows):
+    """Statements selectinload needs for rows parents; it sends at most 500 ids per IN"""
+    return max(-(-rows // 500), 1)
+
+
+# name: (request builder, expected status, most statements per request).
+# A callable bound receives the number of tasks per project.
+SCENARIOS = {
+    'index': (index, 200, 2),
+    'project_detail': (project_detail, 200, lambda tasks: 2 + selectin_batches(tasks)),
+    'task_list': (task_list, 200, 2),
+    'task_create': (task_create, 201, 10),
+    'apply_template': (apply_template, 302, 17),
+    'complete_task': (complete_task, 302, 9),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    data = parser.add_argument_group('dataset')
+    data.add_argument('--projects', type=int, default=20)
+    data.add_argument('--tasks', type=int, default=200, help='tasks per project')
+    data.add_argument('--density', type=float, default=1.0, help='average dependencies per task')
+    data.add_argument('--templates', type=int, default=5)
+    data.add_argument('--template-tasks', type=int, default=10, help='tasks per template')
+    data.add_argument('--seed', type=int, default=0)
+    data.add_argument('--database-url', help='empty database to use instead of a temporary SQLite file')
+    run = parser.add_argument_group('run')
+    run.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='run only these (repeatable)')
+    run.add_argument('--requests', type=int, default=50, help='measured requests per scenario')
+    run.add_argument('--warmup', type=int, default=5, help='unmeasured requests before each scenario')
+    run.add_argument('--threads', type=int, default=1, help='concurrent clients')
+    run.add_argument('--response-cache', action='store_true', help='keep the response cache enabled')
+    run.add_argument('--replicas', type=int, default=0, help='read from this many SQLite copies of the database')
+    run.add_argument('--output', help='write the results to this JSON file')
+    run.add_argument('--check', action='store_true', help='fail when a statement bound is exceeded')
+    return parser.parse_args()
+
+
+def percentile(ordered, q):
+    """The q-th percentile of sorted values, interpolating between neighbours"""
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class StatementCounter:
+    """Counts the SQL statements each thread executes"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, 'count', 0)
+
+
+def send(app, counter, builder, expected, fixture, number):
+    """Send one request; return its latency in milliseconds and statement count"""
+    method, url, kwargs = builder(fixture, number)
+    client = app.test_client()
+    counter.reset()
+    started = time.perf_counter()
+    response = client.open(url, method=method, **kwargs)
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != expected:
+        raise SystemExit(f'{method} {url} returned {response.status_code}, expected {expected}')
+    return elapsed, counter.count
+
+
+def run_scenario(app, counter, fixture, name, args):
+    builder, expected, bound = SCENARIOS[name]
+    if callable(bound):
+        bound = bound(args.tasks)
+    for number in range(args.warmup):
+        send(app, counter, builder, expected, fixture, number)
+    numbers = range(args.warmup, args.warmup + args.requests)
+    started = time.perf_counter()
+    if args.threads > 1:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            samples = list(executor.map(lambda number: send(app, counter, builder, expected, fixture, number), numbers))
+    else:
+        samples = [send(app, counter, builder, expected, fixture, number) for number in numbers]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in samples)
+    statements = [count for _, count in samples]
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / wall, 2),
+        'latency_ms': {
+            'min': round(latencies[0], 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            **{f'p{q}': round(percentile(latencies, q), 3) for q in PERCENTILES},
+            'max': round(latencies[-1], 3),
+        },
+        'statements': {
+            'mean': round(sum(statements) / len(statements), 2),
+            'max': max(statements),
+            'bound': bound,
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    if args.requests < 1:
+        raise SystemExit('--requests must be at least 1')
+    if args.replicas and args.database_url:
+        raise SystemExit('--replicas copies the temporary SQLite database; it can\'t be used with --database-url')
+    directory = tempfile.mkdtemp(prefix='task-flask-bench-')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    replicas = [os.path.join(directory, f'replica-{number}.db') for number in range(1, args.replicas + 1)]
+    os.environ['DATABASE_REPLICA_URLS'] = ','.join(f'sqlite:///{path}' for path in replicas)
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    from app import create_app, db, response_cache
+    from datagen import generate
+    from replicas import copy_sqlite_database
+
+    # Replicas are checked once, during the warmup, rather than between measured requests
+    app = create_app({'REPLICA_HEALTH_INTERVAL': 3600})
+    with app.app_context():
+        db.create_all()
+        dataset = generate(
+            args.projects, args.tasks, args.density, args.templates, args.template_tasks, args.seed
+        )
+        fixture = Fixture()
+        for path in replicas:
+            copy_sqlite_database(db.engine.url.database, path)
+        dialect = db.engine.dialect.name
+        counter = StatementCounter()
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', counter)
+    response_cache.enabled = args.response_cache
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'database': dialect,
+        'dataset': {
+            'seed': args.seed, 'density': args.density, 'tasks_per_project': args.tasks, **dataset,
+        },
+        'settings': {
+            'requests': args.requests, 'warmup': args.warmup, 'threads': args.threads,
+            'response_cache': args.response_cache, 'replicas': args.replicas,
+        },
+        'scenarios': {},
+    }
+    print(f"{dataset['projects']} projects, {dataset['tasks']} tasks, {dataset['dependencies']} dependencies, "
+          f"{dataset['templates']} templates on {dialect} with {args.replicas} replica(s); "
+          f"{args.requests} requests x {args.threads} thread(s)")
+    print(f"{'scenario':<16}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'req/s':>9}{'SQL mean':>10}{'SQL max':>9}")
+    exceeded = []
+    # Reads first, so that writes do not change what they measure
+    for name in args.scenario or list(SCENARIOS):
+        result = run_scenario(app, counter, fixture, name, args)
+        results['scenarios'][name] = result
+        latency, statements = result['latency_ms'], result['statements']
+        print(f"{name:<16}{latency['p50']:>9.2f}{latency['p90']:>9.2f}{latency['p99']:>9.2f}"
+              f"{result['throughput_rps']:>9.1f}{statements['mean']:>10.1f}{statements['max']:>9}")
+        if statements['max'] > statements['bound']:
+            exceeded.append(f"{name}: {statements['max']} statements per request, bound is {statements['bound']}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Results written to {args.output}')
+    for message in exceeded:
+        print(f'Statement bound exceeded: {message}')
+    if args.check and exceeded:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
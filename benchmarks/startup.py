@@ -0,0 +1,165 @@
+"""Measure how long the app takes to start and to answer its first requests.
+
+Every sample runs in a fresh Python process against a throwaway SQLite
+database, so nothing is already imported or cached:
+
+- ``import``: importing ``app.py``
+- ``create_app``: building and configuring the application
+- ``first request``: the first ``GET /projects`` (engine connect, first query)
+- ``first /openapi.json``: generating the API spec, which is deferred
+  until it is first requested
+
+Then one process measures steady-state ``GET /projects`` throughput
+through the test client, which is what a single worker thread can do on
+one core, with the response cache off. With ``--gunicorn``, it also
+starts ``gunicorn.conf.py`` with ``--workers`` workers and measures
+requests per second over HTTP, response cache included.
+
+    python benchmarks/startup.py --samples 5 --gunicorn --workers 2
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints its timings in milliseconds as JSON
+STARTUP = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+with application.app_context():
+    app.db.create_all()
+client = application.test_client()
+ready = time.perf_counter()
+assert client.get('/projects').status_code == 200
+first = time.perf_counter()
+assert client.get('/openapi.json').status_code == 200
+spec = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first request': (first - ready) * 1000,
+    'first /openapi.json': (spec - first) * 1000,
+}))
+'''
+
+THROUGHPUT = '''
+import json, sys, time
+import app
+application = app.create_app()
+with application.app_context():
+    app.db.create_all()
+app.response_cache.enabled = False
+client = application.test_client()
+for _ in range(20):
+    client.get('/projects')
+count = int(sys.argv[1])
+started = time.perf_counter()
+for _ in range(count):
+    client.get('/projects')
+print(json.dumps(count / (time.perf_counter() - started)))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5, help='fresh processes to time')
+    parser.add_argument('--requests', type=int, default=500, help='requests for the throughput figures')
+    parser.add_argument('--gunicorn', action='store_true', help='also measure gunicorn over HTTP')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    return parser.parse_args()
+
+
+def run_python(code, env, *args):
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during startup')
+        try:
+            urllib.request.urlopen(url).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('gunicorn did not start in time')
+
+
+def gunicorn_throughput(env, args):
+    """Requests per second over HTTP, with a client thread per server thread"""
+    port = free_port()
+    url = f'http://127.0.0.1:{port}/projects'
+    env = {**env, 'PORT': str(port), 'WEB_CONCURRENCY': str(args.workers), 'GUNICORN_THREADS': str(args.threads)}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(url, process)
+
+        def get(_):
+            urllib.request.urlopen(url).close()
+
+        with ThreadPoolExecutor(max_workers=args.workers * args.threads) as executor:
+            list(executor.map(get, range(50)))
+            started = time.perf_counter()
+            list(executor.map(get, range(args.requests)))
+            return args.requests / (time.perf_counter() - started)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    args = parse_args()
+    directory = tempfile.mkdtemp(prefix='task-flask-bench-')
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        'PYTHONPATH': ROOT,
+    }
+
+    samples = [run_python(STARTUP, env) for _ in range(args.samples)]
+    print(f'Startup over {args.samples} fresh process(es), median (min-max) in ms:')
+    for phase in samples[0]:
+        values = [sample[phase] for sample in samples]
+        print(f'  {phase:<22}{statistics.median(values):>9.1f} ({min(values):.1f}-{max(values):.1f})')
+    total = [sum(sample.values()) for sample in samples]
+    print(f"  {'total':<22}{statistics.median(total):>9.1f}")
+
+    rps = run_python(THROUGHPUT, env, str(args.requests))
+    print(f'Test client, one thread: {rps:.0f} GET /projects per second')
+    if args.gunicorn:
+        rps = gunicorn_throughput(env, args)
+        print(f'gunicorn, {args.workers} worker(s) x {args.threads} thread(s): {rps:.0f} GET /projects per second '
+              f'({rps / args.workers:.0f} per worker)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Response caching for read-mostly API endpoints.
+
+Cached responses are grouped into namespaces such as ``project:3`` or
+``task:12``. Every namespace has a generation stamp that is part of the
+cache key, so invalidating a namespace only means moving its stamp
+forward: stale entries become unreachable and age out of the LRU. The
+stamps live in the backend, which lets several workers share them
+through Redis.
+"""
+import hashlib
+import itertools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+
+class LRUCache:
+    """Thread-safe mapping bounded to maxsize entries that expire after ttl seconds"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MemoryBackend:
+    """Keeps entries and generation stamps in the current process"""
+
+    def __init__(self, maxsize, ttl):
+        self.entries = LRUCache(maxsize, ttl)
+        # Stamps are bounded too: a forgotten namespace gets a brand new
+        # stamp, which can't match any entry cached before.
+        self.stamps = LRUCache(maxsize * 4, ttl=None)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.entries.set(key, value, ttl)
+
+    def generations(self, names):
+        with self._lock:
+            stamps = []
+            for name in names:
+                stamp = self.stamps.get(name)
+                if stamp is None:
+                    stamp = next(self._counter)
+                    self.stamps.set(name, stamp)
+                stamps.append(stamp)
+            return stamps
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self.stamps.set(name, next(self._counter))
+
+    def clear(self):
+        self.entries.clear()
+        self.stamps.clear()
+
+
+class RedisBackend:
+    """Shares entries and generation stamps between workers through Redis"""
+
+    def __init__(self, url, ttl, prefix='task-flask:cache:'):
+        try:
+            import redis
+        except ImportError as err:
+            raise RuntimeError('RESPONSE_CACHE_URL points to Redis but the redis package is not installed') from err
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl or None)
+
+    def generations(self, names):
+        if not names:
+            return []
+        stamps = self.client.mget([self.prefix + 'gen:' + name for name in names])
+        return [int(stamp or 0) for stamp in stamps]
+
+    def bump(self, names):
+        pipeline = self.client.pipeline(transaction=False)
+        for name in names:
+            pipeline.incr(self.prefix + 'gen:' + name)
+        pipeline.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+# Headers that belong to a single response and are not replayed from cache
+SKIPPED_HEADERS = {'content-length', 'date', 'set-cookie', 'etag'}
+
+
+class ResponseCache:
+    """Flask extension caching GET responses by namespace.
+
+    Configuration:
+
+    - ``RESPONSE_CACHE_ENABLED``: turn caching on or off (default on)
+    - ``RESPONSE_CACHE_URL``: ``redis://`` URL of a shared backend; the
+      default keeps the cache in process memory
+    - ``RESPONSE_CACHE_SIZE``: maximum number of cached responses per process
+    - ``RESPONSE_CACHE_TTL``: seconds before a cached response expires
+
+    ``entry_ttl``, when set, is called before a response is stored and
+    may return a lifetime in seconds to use instead of ``RESPONSE_CACHE_TTL``.
+    ``key_variant``, when set, is called before the cache is consulted and
+    may return a string telling apart responses to the same URL, such as
+    the database they are read from; each variant is cached separately.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.entry_ttl = None
+        self.key_variant = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_URL', None)
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 2048)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 60)
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        url = app.config['RESPONSE_CACHE_URL']
+        if url:
+            self.backend = RedisBackend(url, app.config['RESPONSE_CACHE_TTL'])
+        else:
+            self.backend = MemoryBackend(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+        app.extensions['response_cache'] = self
+
+    def invalidate(self, names):
+        """Make every response cached under the given namespaces stale"""
+        names = sorted(set(names))
+        if names and self.backend is not None:
+            self.backend.bump(names)
+
+    def cached(self, *namespaces, unless=None):
+        """Cache a GET view under namespaces formatted from its URL arguments.
+
+        Responses carry a strong ETag (a hash of the body unless the view
+        already set one) and ``If-None-Match`` is answered with 304.
+        Requests for which ``unless()`` returns true bypass the cache.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or (unless is not None and unless()):
+                    return func(*args, **kwargs)
+                names = [namespace.format(**kwargs) for namespace in namespaces]
+                stamps = self.backend.generations(names)
+                key = request.full_path + '#' + ','.join(map(str, stamps))
+                variant = self.key_variant() if self.key_variant is not None else None
+                if variant:
+                    key += '@' + variant
+
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(func(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    etag = response.get_etag()[0] or hashlib.sha1(body).hexdigest()
+                    headers = [
+                        (name, value) for name, value in response.headers
+                        if name.lower() not in SKIPPED_HEADERS
+                    ]
+                    ttl = self.entry_ttl() if self.entry_ttl is not None else None
+                    self.backend.set(key, (body, headers, etag), ttl)
+                    cache_status = 'MISS'
+                else:
+                    body, headers, etag = entry
+                    response = make_response(body, 200, headers)
+                    cache_status = 'HIT'
+
+                response.set_etag(etag)
+                response.headers['X-Cache'] = cache_status
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+class FragmentCache:
+    """Flask extension caching rendered template fragments.
+
+    A fragment is stored under a name such as ``task:12`` together with
+    the stamp it was rendered for, typically the entity's version. A
+    lookup with a different stamp renders the fragment again and replaces
+    the entry, so every entity holds at most one entry and a stale
+    fragment is never served, even in workers that missed the
+    invalidation. In templates::
+
+        {% call cached_fragment('task:' ~ task.id, task.version) %}
+            ...
+        {% endcall %}
+
+    Configuration:
+
+    - ``FRAGMENT_CACHE_ENABLED``: turn caching on or off (default on)
+    - ``FRAGMENT_CACHE_SIZE``: maximum number of fragments per process
+    """
+
+    def __init__(self, app=None):
+        self.entries = None
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 5000)
+        self.enabled = app.config['FRAGMENT_CACHE_ENABLED']
+        self.entries = LRUCache(app.config['FRAGMENT_CACHE_SIZE'], ttl=None)
+        app.add_template_global(self.fragment, 'cached_fragment')
+        app.extensions['fragment_cache'] = self
+
+    def fragment(self, name, stamp, caller):
+        """The fragment rendered by caller() for stamp, from cache when possible"""
+        if not self.enabled:
+            return caller()
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        html = caller()
+        self.entries.set(name, (stamp, html))
+        return html
+
+    def invalidate(self, names):
+        """Drop the fragments cached under the given names"""
+        if self.entries is not None:
+            for name in names:
+                self.entries.pop(name)
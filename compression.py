@@ -0,0 +1,116 @@
+"""Compression of HTTP responses.
+
+Responses are compressed with brotli or gzip, whichever the client
+prefers in ``Accept-Encoding`` (brotli on a tie, when the ``brotli``
+package is installed). Only compressible types above a size threshold
+are compressed; streamed responses such as the event streams and
+responses that are already encoded go out as they are.
+
+A compressed response is a different representation of the resource,
+so its ETag gets the coding as a suffix (``"3-7-gzip"``). The suffix is
+removed from ``If-None-Match`` and ``If-Match`` before the views see
+them, so the views and the response cache keep comparing the ETags
+they set themselves.
+"""
+import gzip
+import re
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# File name suffixes of precompressed files, by coding
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+ETAG_CODING = re.compile(r'-(br|gzip)"')
+
+
+def codings():
+    """The codings this server can produce, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data, coding, level=None):
+    """data encoded with coding; without a level, compress as well as possible"""
+    if coding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+class Compress:
+    """Flask extension compressing responses.
+
+    Configuration:
+
+    - ``COMPRESS_ENABLED``: turn compression on or off (default on)
+    - ``COMPRESS_MIN_SIZE``: bytes below which responses are sent as they are
+    - ``COMPRESS_MIMETYPES``: content types worth compressing
+    - ``COMPRESS_GZIP_LEVEL`` and ``COMPRESS_BROTLI_QUALITY``: effort
+      spent per response; higher levels are smaller but slower
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_MIMETYPES', [
+            'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+            'application/javascript', 'application/json', 'image/svg+xml',
+        ])
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        self.enabled = app.config['COMPRESS_ENABLED']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.mimetypes = set(app.config['COMPRESS_MIMETYPES'])
+        self.levels = {'gzip': app.config['COMPRESS_GZIP_LEVEL'], 'br': app.config['COMPRESS_BROTLI_QUALITY']}
+        if not self.enabled:
+            return
+        app.before_request(self._strip_etag_codings)
+        app.after_request(self._compress)
+        app.extensions['compress'] = self
+
+    def _strip_etag_codings(self):
+        for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            value = request.environ.get(header)
+            match = value and ETAG_CODING.search(value)
+            if match:
+                request.environ[header] = ETAG_CODING.sub('"', value)
+                if header == 'HTTP_IF_NONE_MATCH':
+                    g.etag_coding = match.group(1)
+
+    def _compress(self, response):
+        if response.status_code == 304:
+            # Confirms the representation the client has, compressed or not
+            coding = g.pop('etag_coding', None)
+            etag, weak = response.get_etag()
+            if coding and etag:
+                response.set_etag(f'{etag}-{coding}', weak)
+            return response
+        if (
+            response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in self.mimetypes
+        ):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        coding = request.accept_encodings.best_match(codings())
+        if coding is None:
+            return response
+        compressed = compress(data, coding, self.levels[coding])
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = coding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{coding}', weak)
+        return response
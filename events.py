@@ -0,0 +1,153 @@
+"""Publish/subscribe for the Server-Sent Events change feeds.
+
+Messages are published to named channels such as ``project:3`` and
+delivered to every subscription open on that channel at the time. The
+broker is only a wake-up path: the durable record is the change log in
+the database, which subscribers read to catch up after a reconnect or
+after falling behind. The default backend works within one process;
+with several workers, point ``EVENT_BROKER_URL`` at Redis.
+"""
+import json
+import queue
+import threading
+
+
+class Overflow(Exception):
+    """A subscriber fell behind and lost messages; it must catch up from the log"""
+
+
+class MemorySubscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.messages = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next message, or None after timeout seconds; raises Overflow"""
+        if self.overflowed:
+            self.overflowed = False
+            # What is queued is older than the gap, so it is caught up with the rest
+            with self.messages.mutex:
+                self.messages.queue.clear()
+            raise Overflow
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """Delivers messages to the subscribers of the current process"""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, channel):
+        subscription = MemorySubscription(self, channel, self.queue_size)
+        with self._lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self.channels.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.channels[subscription.channel]
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    def get(self, timeout):
+        """The next message, or None after timeout seconds"""
+        message = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return None if message is None else json.loads(message['data'])
+
+    def close(self):
+        self.pubsub.close()
+
+
+class RedisBroker:
+    """Delivers messages to the subscribers of every worker through Redis pub/sub"""
+
+    def __init__(self, url, prefix='task-flask:events:'):
+        try:
+            import redis
+        except ImportError as err:
+            raise RuntimeError('EVENT_BROKER_URL points to Redis but the redis package is not installed') from err
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message))
+
+    def subscribe(self, channel):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.prefix + channel)
+        return RedisSubscription(pubsub)
+
+
+class EventBroker:
+    """Flask extension publishing change notifications to event streams.
+
+    Configuration:
+
+    - ``EVENT_BROKER_URL``: ``redis://`` URL of a shared broker; the
+      default delivers messages within the current process
+    - ``EVENT_QUEUE_SIZE``: messages buffered per subscriber before it is
+      told to catch up from the change log (memory broker only)
+    - ``EVENT_HEARTBEAT``: seconds between keep-alive comments on idle streams
+    - ``EVENT_STREAM_TIMEOUT``: seconds after which a stream is closed so
+      the client reconnects (and a worker thread is freed)
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENT_BROKER_URL', None)
+        app.config.setdefault('EVENT_QUEUE_SIZE', 1000)
+        app.config.setdefault('EVENT_HEARTBEAT', 15)
+        app.config.setdefault('EVENT_STREAM_TIMEOUT', 300)
+        url = app.config['EVENT_BROKER_URL']
+        if url:
+            self.backend = RedisBroker(url)
+        else:
+            self.backend = MemoryBroker(app.config['EVENT_QUEUE_SIZE'])
+        app.extensions['event_broker'] = self
+
+    def publish(self, channel, message):
+        """Send a JSON-serializable message to the current subscribers of channel"""
+        self.backend.publish(channel, message)
+
+    def subscribe(self, channel):
+        """Open a subscription; call ``get(timeout)`` to wait for messages and ``close()`` when done"""
+        return self.backend.subscribe(channel)
+
+
+def format_event(event_id, event_type, data):
+    """One Server-Sent Events message; data is already encoded as JSON"""
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
@@ -0,0 +1,191 @@
+"""Task dependency graph algorithms.
+
+The graph is stored in compressed sparse row form: task ids are mapped
+to dense indexes and the edges of every node live in flat integer
+arrays, so projects with tens of thousands of tasks stay cheap to load
+and walk.
+"""
+from array import array
+from collections import deque
+from datetime import date
+
+
+class CycleError(ValueError):
+    """Raised when the dependency graph is not acyclic"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__('Dependency cycle: ' + ' -> '.join(str(task_id) for task_id in cycle))
+
+
+def _csr(node_count, pairs):
+    """Build (offsets, targets) arrays from (source, target) index pairs"""
+    offsets = array('l', [0]) * (node_count + 1)
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    targets = array('l', [0]) * len(pairs)
+    fill = array('l', offsets[:-1])
+    for source, target in pairs:
+        targets[fill[source]] = target
+        fill[source] += 1
+    return offsets, targets
+
+
+class DependencyGraph:
+    """Directed graph where an edge goes from a task to one of its dependencies.
+
+    ``nodes`` is an iterable of ``(task_id, status, due_date)`` and
+    ``edges`` of ``(task_id, dependency_id)``. Edges that mention an
+    unknown task are ignored.
+    """
+
+    def __init__(self, nodes, edges):
+        self.ids = array('l')
+        self.done = bytearray()
+        self.due = array('l')  # date ordinals, 0 when there is no due date
+        for task_id, status, due_date in nodes:
+            self.ids.append(task_id)
+            self.done.append(status == 'Done')
+            self.due.append(due_date.toordinal() if due_date else 0)
+        self.index = {task_id: i for i, task_id in enumerate(self.ids)}
+
+        index = self.index
+        pairs = [
+            (index[task_id], index[dependency_id])
+            for task_id, dependency_id in edges
+            if task_id in index and dependency_id in index
+        ]
+        count = len(self.ids)
+        self.dep_offsets, self.deps = _csr(count, pairs)
+        self.rdep_offsets, self.rdeps = _csr(count, [(target, source) for source, target in pairs])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _dependencies(self, i):
+        return self.deps[self.dep_offsets[i]:self.dep_offsets[i + 1]]
+
+    def _dependents(self, i):
+        return self.rdeps[self.rdep_offsets[i]:self.rdep_offsets[i + 1]]
+
+    def _path(self, parent, end):
+        path = [end]
+        while parent[path[-1]] >= 0:
+            path.append(parent[path[-1]])
+        return path
+
+    def cycle_through(self, task_id):
+        """Return a cycle containing task_id as a list of ids, or None"""
+        start = self.index.get(task_id)
+        if start is None:
+            return None
+        parent = array('l', [-1]) * len(self.ids)
+        seen = bytearray(len(self.ids))
+        queue = deque()
+        for dependency in self._dependencies(start):
+            if not seen[dependency]:
+                seen[dependency] = 1
+                queue.append(dependency)
+        while queue:
+            node = queue.popleft()
+            if node == start:
+                path = self._path(parent, node)
+                return [task_id] + [self.ids[i] for i in reversed(path)]
+            for dependency in self._dependencies(node):
+                if not seen[dependency]:
+                    seen[dependency] = 1
+                    parent[dependency] = node
+                    queue.append(dependency)
+        return None
+
+    def find_cycle(self):
+        """Return any cycle in the graph as a list of ids, or None"""
+        remaining = self._kahn()[1]
+        node = next((i for i, count in enumerate(remaining) if count), None)
+        if node is None:
+            return None
+        # Every leftover node still has a leftover dependency, so following
+        # them must eventually revisit a node.
+        position = {}
+        path = []
+        while node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = next(dependency for dependency in self._dependencies(node) if remaining[dependency])
+        cycle = path[position[node]:] + [node]
+        return [self.ids[i] for i in cycle]
+
+    def _kahn(self):
+        """Order nodes dependencies-first; also return leftover in-degrees"""
+        pending = array('l', (
+            self.dep_offsets[i + 1] - self.dep_offsets[i] for i in range(len(self.ids))
+        ))
+        queue = deque(i for i, count in enumerate(pending) if count == 0)
+        order = array('l')
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for dependent in self._dependents(node):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    queue.append(dependent)
+        return order, pending
+
+    def topological_order(self):
+        """Return task ids so that every task comes after its dependencies"""
+        order, _ = self._kahn()
+        if len(order) != len(self.ids):
+            raise CycleError(self.find_cycle())
+        return [self.ids[i] for i in order]
+
+    def blockers(self, task_id):
+        """Return the unfinished tasks task_id transitively waits on.
+
+        The walk stops at finished tasks: whatever they depended on no
+        longer blocks anything.
+        """
+        start = self.index[task_id]
+        seen = bytearray(len(self.ids))
+        seen[start] = 1
+        queue = deque([start])
+        found = []
+        while queue:
+            node = queue.popleft()
+            for dependency in self._dependencies(node):
+                if not seen[dependency]:
+                    seen[dependency] = 1
+                    if not self.done[dependency]:
+                        found.append(self.ids[dependency])
+                        queue.append(dependency)
+        return found
+
+    def critical_path(self):
+        """Return ``(task_ids, finish_date)`` for the chain that sets the finish date.
+
+        A task cannot finish before its own due date nor before any of
+        its dependencies finish. The critical path is the dependency
+        chain leading to the latest such finish, preferring longer
+        chains on ties. Ids are listed first dependency first.
+        """
+        order, _ = self._kahn()
+        if len(order) != len(self.ids):
+            raise CycleError(self.find_cycle())
+        if not order:
+            return [], None
+
+        finish = array('l', self.due)
+        length = array('l', [1]) * len(self.ids)
+        parent = array('l', [-1]) * len(self.ids)
+        for node in order:
+            for dependency in self._dependencies(node):
+                if (finish[dependency], length[dependency] + 1) > (finish[node], length[node]):
+                    finish[node] = max(finish[node], finish[dependency])
+                    length[node] = length[dependency] + 1
+                    parent[node] = dependency
+
+        end = max(order, key=lambda i: (finish[i], length[i]))
+        path = self._path(parent, end)
+        finish_date = date.fromordinal(finish[end]) if finish[end] else None
+        return [self.ids[i] for i in reversed(path)], finish_date
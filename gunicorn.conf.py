@@ -0,0 +1,46 @@
+"""Gunicorn settings for running the app in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker processes are forked from a master that has already imported
+and configured the app (``preload_app``), so each worker starts without
+repeating that work. Every worker serves ``GUNICORN_THREADS`` requests
+at a time, which keeps the event streams from tying up whole processes.
+
+Environment:
+
+- ``WEB_CONCURRENCY``: worker processes (default two per CPU plus one)
+- ``GUNICORN_THREADS``: threads per worker (default 4)
+- ``PORT``: port to listen on (default 5000)
+- ``GUNICORN_TIMEOUT``: seconds before a silent worker is restarted (default 30)
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Seen by create_app(), which warns when the workers can't share their caches
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = True
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    # Connections opened in the master, to the primary or a replica, must
+    # not be shared with the workers; drop them from the pools without
+    # closing the master's copies
+    from app import db
+
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
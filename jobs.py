@@ -0,0 +1,102 @@
+"""Background jobs run by an in-process thread pool.
+
+Jobs are persisted by a store (the ``job`` table, see app.py) so their
+status can be polled and a crashed worker's jobs can be resumed. The
+queue only knows job ids: a worker loads the job from the store, runs
+the handler registered under its name and records the outcome,
+retrying with exponential backoff when the handler raises. Once a job
+has succeeded or failed for good, the handler's cleanup runs, if any.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobError(Exception):
+    """A job failure that retrying cannot fix"""
+
+
+class JobQueue:
+    """Flask extension running stored jobs on a thread pool.
+
+    Configuration:
+
+    - ``JOB_WORKERS``: threads in the pool (default 4)
+    - ``JOB_MAX_ATTEMPTS``: runs before a failing job is given up (default 3)
+    - ``JOB_RETRY_DELAY``: seconds before the first retry, doubled after
+      every further failure (default 1)
+
+    ``store`` must provide ``start(job_id)``, returning ``(name, payload,
+    attempt)`` or None when the job is not runnable, ``finish(job_id,
+    result)`` and ``fail(job_id, error, retry)``.
+    """
+
+    def __init__(self, app=None, store=None):
+        self.handlers = {}
+        self.cleanups = {}
+        self.store = store
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 4)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_RETRY_DELAY', 1)
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+        app.extensions['jobs'] = self
+
+    def handler(self, name, cleanup=None):
+        """Register the function that runs jobs called name.
+
+        ``cleanup`` is called with the job's payload once the job won't
+        run again, whether it succeeded or not, to release what the
+        payload refers to.
+        """
+        def decorator(func):
+            self.handlers[name] = func
+            if cleanup is not None:
+                self.cleanups[name] = cleanup
+            return func
+        return decorator
+
+    def submit(self, job_id):
+        """Run a stored job on a worker thread"""
+        return self.executor.submit(self._run_in_context, job_id)
+
+    def _run_in_context(self, job_id):
+        with self.app.app_context():
+            try:
+                self.run(job_id)
+            except Exception:
+                self.app.logger.exception('Job %s crashed', job_id)
+
+    def run(self, job_id):
+        """Run a stored job in the current thread until it succeeds or fails for good"""
+        delay = self.app.config['JOB_RETRY_DELAY']
+        while True:
+            job = self.store.start(job_id)
+            if job is None:
+                return
+            name, payload, attempt = job
+            try:
+                result = self.handlers[name](**payload)
+            except Exception as err:
+                retry = not isinstance(err, JobError) and attempt < self.app.config['JOB_MAX_ATTEMPTS']
+                self.app.logger.warning('Job %s (%s) failed on attempt %s: %s', job_id, name, attempt, err)
+                self.store.fail(job_id, str(err) or type(err).__name__, retry)
+                if not retry:
+                    self._clean_up(name, payload)
+                    return
+                time.sleep(delay)
+                delay *= 2
+            else:
+                self.store.finish(job_id, result)
+                self._clean_up(name, payload)
+                return
+
+    def _clean_up(self, name, payload):
+        cleanup = self.cleanups.get(name)
+        if cleanup is not None:
+            cleanup(**payload)
@@ -0,0 +1,191 @@
+"""Request instrumentation exported in Prometheus text format.
+
+Every request records its latency, the number and total time of the SQL
+statements it ran, the time spent rendering templates and the time
+spent serializing responses. The figures are published at
+``/metrics``. Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` are
+logged together with the statements they executed, grouped so that an
+N+1 pattern shows up as one statement repeated many times.
+"""
+import os
+import time
+from collections import Counter
+
+from flask import (
+    Response, before_render_template, current_app, g, has_request_context, request, template_rendered,
+)
+from marshmallow import Schema
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestStats:
+    """Figures collected while a single request is handled"""
+
+    def __init__(self, keep_statements):
+        self.started = time.perf_counter()
+        self.statement_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.serialization_time = 0.0
+        self.serializing = False
+        self.statements = [] if keep_statements else None
+
+
+def current_stats():
+    """Return the stats of the request being handled, or None"""
+    if not has_request_context():
+        return None
+    return g.get('request_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('query_started')
+    if stats is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats.statement_count += 1
+    stats.sql_time += elapsed
+    if stats.statements is not None:
+        stats.statements.append((statement, elapsed))
+
+
+class TimedSchema(Schema):
+    """Schema whose dump time counts towards the request's serialization time"""
+
+    def dump(self, obj, *, many=None):
+        stats = current_stats()
+        # Nested schemas are already covered by the outermost dump
+        if stats is None or stats.serializing:
+            return super().dump(obj, many=many)
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().dump(obj, many=many)
+        finally:
+            stats.serializing = False
+            stats.serialization_time += time.perf_counter() - started
+
+
+class Metrics:
+    """Flask extension measuring requests and serving them at ``/metrics``.
+
+    Configuration:
+
+    - ``METRICS_ENABLED``: turn instrumentation on or off (default on)
+    - ``METRICS_PATH``: URL of the Prometheus endpoint
+    - ``SLOW_REQUEST_THRESHOLD_MS``: log requests slower than this, with
+      their SQL; unset disables the slow-request log
+
+    With several worker processes, set ``PROMETHEUS_MULTIPROC_DIR`` so the
+    endpoint aggregates every worker.
+    """
+
+    def __init__(self, app=None):
+        self.registry = CollectorRegistry()
+        endpoint = ('endpoint', 'method', 'status')
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Request latency', endpoint,
+            registry=self.registry,
+        )
+        self.statements = Histogram(
+            'http_request_sql_statements', 'SQL statements executed per request', endpoint,
+            buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+            registry=self.registry,
+        )
+        self.sql_time = Histogram(
+            'http_request_sql_seconds', 'Time spent in SQL per request', endpoint,
+            registry=self.registry,
+        )
+        self.serialization_time = Histogram(
+            'http_request_serialization_seconds', 'Time spent serializing responses per request', endpoint,
+            registry=self.registry,
+        )
+        self.template_time = Histogram(
+            'template_render_seconds', 'Template render time', ('template',),
+            registry=self.registry,
+        )
+        self.slow_threshold = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.config.setdefault('SLOW_REQUEST_THRESHOLD_MS', None)
+        if not app.config['METRICS_ENABLED']:
+            return
+        threshold = app.config['SLOW_REQUEST_THRESHOLD_MS']
+        self.slow_threshold = float(threshold) / 1000 if threshold else None
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.export)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        if request.endpoint != 'metrics':
+            g.request_stats = RequestStats(keep_statements=self.slow_threshold is not None)
+
+    def _before_render(self, sender, template, context, **extra):
+        if current_stats() is not None:
+            g.template_started = time.perf_counter()
+
+    def _rendered(self, sender, template, context, **extra):
+        started = g.pop('template_started', None) if has_request_context() else None
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        g.request_stats.template_time += elapsed
+        self.template_time.labels(template.name or 'string').observe(elapsed)
+
+    def _finish(self, response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        labels = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+        self.latency.labels(*labels).observe(elapsed)
+        self.statements.labels(*labels).observe(stats.statement_count)
+        self.sql_time.labels(*labels).observe(stats.sql_time)
+        self.serialization_time.labels(*labels).observe(stats.serialization_time)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self._log_slow_request(stats, elapsed)
+        return response
+
+    def _log_slow_request(self, stats, elapsed):
+        counts = Counter()
+        times = Counter()
+        for statement, duration in stats.statements:
+            counts[statement] += 1
+            times[statement] += duration
+        lines = [
+            f'Slow request: {request.method} {request.full_path.rstrip("?")} took {elapsed * 1000:.1f} ms '
+            f'({stats.statement_count} SQL statements in {stats.sql_time * 1000:.1f} ms, '
+            f'templates {stats.template_time * 1000:.1f} ms, '
+            f'serialization {stats.serialization_time * 1000:.1f} ms)'
+        ]
+        for statement, count in sorted(counts.items(), key=lambda item: -times[item[0]]):
+            lines.append(f'  {count}x {times[statement] * 1000:.1f} ms: {" ".join(statement.split())}')
+        current_app.logger.warning('\n'.join(lines))
+
+    def export(self):
+        """Serve the collected metrics in Prometheus text format"""
+        registry = self.registry
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
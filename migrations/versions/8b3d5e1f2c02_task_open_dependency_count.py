@@ -0,0 +1,43 @@
+"""Track unfinished dependencies per task
+
+Revision ID: 8b3d5e1f2c02
+Revises: 4f1c2a9e0b01
+Create Date: 2026-10-17 18:05:12.113406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3d5e1f2c02'
+down_revision = '4f1c2a9e0b01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('open_dependency_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_task_project_ready', ['project_id', 'open_dependency_count', 'status'], unique=False)
+
+    with op.batch_alter_table('task_dependencies', schema=None) as batch_op:
+        batch_op.create_index('ix_task_dependencies_dependency_id', ['dependency_id'], unique=False)
+
+    # Backfill the counts of existing tasks
+    op.execute(
+        "UPDATE task SET open_dependency_count = ("
+        " SELECT count(*) FROM task_dependencies"
+        " JOIN task AS dependency ON dependency.id = task_dependencies.dependency_id"
+        " WHERE task_dependencies.task_id = task.id"
+        " AND coalesce(dependency.status, '') != 'Done')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('task_dependencies', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_dependencies_dependency_id')
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_project_ready')
+        batch_op.drop_column('open_dependency_count')
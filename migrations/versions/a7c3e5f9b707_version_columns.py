@@ -0,0 +1,39 @@
+"""Version columns for optimistic concurrency on tasks and projects
+
+Revision ID: a7c3e5f9b707
+Revises: f1a2b3c4d606
+Create Date: 2026-10-17 20:15:33.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_statements
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f9b707'
+down_revision = 'f1a2b3c4d606'
+branch_labels = None
+depends_on = None
+
+
+# Plain ADD COLUMN rather than batch mode: on SQLite a batch rebuild of
+# the task and project tables would drop their full-text search triggers.
+def upgrade():
+    op.add_column('project', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('task', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    # Batch mode rebuilt the tables, dropping the SQLite search triggers
+    dialect = op.get_bind().dialect.name
+    for table in ('task', 'project'):
+        for statement in create_statements(dialect, table):
+            op.execute(statement)
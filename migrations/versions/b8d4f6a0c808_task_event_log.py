@@ -0,0 +1,37 @@
+"""Task change log for the project event streams
+
+Revision ID: b8d4f6a0c808
+Revises: a7c3e5f9b707
+Create Date: 2026-10-17 21:02:41.517264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f6a0c808'
+down_revision = 'a7c3e5f9b707'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('task_event', schema=None) as batch_op:
+        batch_op.create_index('ix_task_event_project_id', ['project_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_event_project_id')
+
+    op.drop_table('task_event')
@@ -0,0 +1,28 @@
+"""Composite indexes for task status and due date filtering
+
+Revision ID: c27a4e9d1b03
+Revises: 8b3d5e1f2c02
+Create Date: 2026-10-17 18:21:40.527193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27a4e9d1b03'
+down_revision = '8b3d5e1f2c02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_project_status_due', ['project_id', 'status', 'due_date'], unique=False)
+        batch_op.create_index('ix_task_project_due', ['project_id', 'due_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_project_due')
+        batch_op.drop_index('ix_task_project_status_due')
@@ -0,0 +1,79 @@
+"""Completion times and the archive of completed tasks
+
+Revision ID: c9f6a8e2d909
+Revises: b8d4f6a0c808
+Create Date: 2026-10-17 22:14:08.634190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_statements
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f6a8e2d909'
+down_revision = 'b8d4f6a0c808'
+branch_labels = None
+depends_on = None
+
+
+# Tasks already done get their completion time from the first archive run.
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # Without AUTOINCREMENT, SQLite hands the id of the last task out
+        # again once it is deleted or archived. Adding it means rebuilding
+        # the table, which drops its search triggers.
+        with op.batch_alter_table(
+            'task', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+        for statement in create_statements(dialect, 'task'):
+            op.execute(statement)
+    else:
+        op.add_column('task', sa.Column('completed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_task_status_completed', 'task', ['status', 'completed_at'], unique=False)
+
+    op.create_table('archived_task',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['project.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_task', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_task_project_id', ['project_id', 'id'], unique=False)
+
+    op.create_table('archived_task_dependencies',
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('dependency_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['archived_task.id'], ),
+    sa.PrimaryKeyConstraint('task_id', 'dependency_id')
+    )
+    with op.batch_alter_table('archived_task_dependencies', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_task_dependencies_dependency_id', ['dependency_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('archived_task_dependencies', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_task_dependencies_dependency_id')
+
+    op.drop_table('archived_task_dependencies')
+    with op.batch_alter_table('archived_task', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_task_project_id')
+
+    op.drop_table('archived_task')
+    op.drop_index('ix_task_status_completed', table_name='task')
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_column('completed_at')
+
+    # Batch mode rebuilt the table, dropping the SQLite search triggers
+    for statement in create_statements(op.get_bind().dialect.name, 'task'):
+        op.execute(statement)
@@ -0,0 +1,30 @@
+"""Dependencies between template tasks
+
+Revision ID: d5e8f3a1c404
+Revises: c27a4e9d1b03
+Create Date: 2026-10-17 18:40:12.117305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e8f3a1c404'
+down_revision = 'c27a4e9d1b03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('template_task_dependencies',
+    sa.Column('template_task_id', sa.Integer(), nullable=False),
+    sa.Column('dependency_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['dependency_id'], ['template_task.id'], ),
+    sa.ForeignKeyConstraint(['template_task_id'], ['template_task.id'], ),
+    sa.PrimaryKeyConstraint('template_task_id', 'dependency_id')
+    )
+
+
+def downgrade():
+    op.drop_table('template_task_dependencies')
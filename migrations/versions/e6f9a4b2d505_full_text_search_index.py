@@ -0,0 +1,35 @@
+"""Full-text search index for tasks and projects
+
+Revision ID: e6f9a4b2d505
+Revises: d5e8f3a1c404
+Create Date: 2026-10-17 19:12:48.604213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_statements, drop_statements, rebuild_statements
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f9a4b2d505'
+down_revision = 'd5e8f3a1c404'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table in ('task', 'project'):
+        for statement in create_statements(dialect, table):
+            op.execute(statement)
+    # Index the rows that already exist
+    for statement in rebuild_statements(dialect):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in ('task', 'project'):
+        for statement in drop_statements(dialect, table):
+            op.execute(statement)
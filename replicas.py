@@ -0,0 +1,186 @@
+"""Routing of read-only views to database replicas.
+
+Replicas are binds in ``SQLALCHEMY_BINDS`` holding copies of the
+primary database. Views decorated with ``ReplicaRouter.read_only`` run
+their queries on a replica, picked round-robin among those that passed
+their last health check; every other view, and any write, uses the
+primary. A client whose request committed a write gets a cookie keeping
+its reads on the primary for ``REPLICA_STICKY_SECONDS``, so it sees its
+own changes while the replicas catch up.
+"""
+import itertools
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+SESSION_KEY = 'replica_bind'
+
+
+class RoutingSession(Session):
+    """Session sending the reads of a replica-routed request to its replica.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        key = self.info.get(SESSION_KEY)
+        if (
+            key is None or bind is not None or self._flushing or getattr(clause, 'is_dml', False)
+            or engine is not self._db.engines[None]
+        ):
+            return engine
+        return self._db.engines[key]
+
+
+def copy_sqlite_database(source, target):
+    """Copy the SQLite database file source over target, consistently even while it is written"""
+    origin, copy = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        origin.backup(copy)
+    finally:
+        origin.close()
+        copy.close()
+
+
+class ReplicaRouter:
+    """Flask extension routing the queries of read-only views to replicas.
+
+    ``db`` must be created with ``session_options={'class_': RoutingSession}``.
+
+    Configuration:
+
+    - ``REPLICA_BINDS``: keys of ``SQLALCHEMY_BINDS`` that are replicas
+      (default: those starting with ``replica``); none routes everything
+      to the primary
+    - ``REPLICA_STICKY_SECONDS``: how long a client reads from the primary
+      after a write
+    - ``REPLICA_STICKY_COOKIE``: name of the cookie marking such clients
+    - ``REPLICA_HEALTH_INTERVAL``: seconds between health checks of a
+      replica; a failed replica is skipped until its next check
+    - ``REPLICA_CACHE_TTL``: seconds results read from a replica may be
+      cached, since they can lag behind the primary
+    """
+
+    def __init__(self, db=None, app=None):
+        self.db = db
+        self.binds = []
+        self.health = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, db=None):
+        self.db = db or self.db
+        app.config.setdefault('REPLICA_BINDS', [
+            key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica')
+        ])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_STICKY_COOKIE', 'read_primary_until')
+        app.config.setdefault('REPLICA_HEALTH_INTERVAL', 10)
+        app.config.setdefault('REPLICA_CACHE_TTL', 5)
+        self.binds = list(app.config['REPLICA_BINDS'])
+        self.health = {key: (True, float('-inf')) for key in self.binds}
+        if not event.contains(self.db.session, 'after_commit', self._note_write):
+            event.listen(self.db.session, 'after_commit', self._note_write)
+        app.after_request(self._stick_to_primary)
+        app.teardown_request(self._release)
+        app.extensions['replica_router'] = self
+
+    def _note_write(self, session):
+        if has_request_context():
+            g.database_written = True
+
+    def _stick_to_primary(self, response):
+        if g.pop('database_written', False):
+            seconds = current_app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(
+                current_app.config['REPLICA_STICKY_COOKIE'], str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def _release(self, exc):
+        if self.db.session.registry.has():
+            self.db.session.info.pop(SESSION_KEY, None)
+
+    def is_sticky(self):
+        """Whether the current client wrote recently enough to read from the primary"""
+        until = request.cookies.get(current_app.config['REPLICA_STICKY_COOKIE'], '')
+        try:
+            return float(until) > time.time()
+        except ValueError:
+            return False
+
+    def is_healthy(self, key):
+        """Whether a replica answered its last health check, checking again once it is due"""
+        healthy, checked = self.health[key]
+        now = time.monotonic()
+        if now - checked < current_app.config['REPLICA_HEALTH_INTERVAL']:
+            return healthy
+        # Recorded first, so concurrent requests don't all run the check
+        self.health[key] = (healthy, now)
+        try:
+            with self.db.engines[key].connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except OperationalError:
+            healthy = False
+        else:
+            healthy = True
+        self.health[key] = (healthy, now)
+        return healthy
+
+    def mark_failed(self, key):
+        self.health[key] = (False, time.monotonic())
+
+    def choose(self):
+        """Bind key of the next healthy replica, or None for the primary"""
+        if not self.binds:
+            return None
+        with self._lock:
+            start = next(self._turn)
+        for offset in range(len(self.binds)):
+            key = self.binds[(start + offset) % len(self.binds)]
+            if self.is_healthy(key):
+                return key
+        return None
+
+    def current(self):
+        """Bind key of the replica serving the current request, or None"""
+        if not self.db.session.registry.has():
+            return None
+        return self.db.session.info.get(SESSION_KEY)
+
+    def cache_ttl(self):
+        """Lifetime for results cached by the current request: short when
+        they were read from a replica, None for the cache's default"""
+        return current_app.config['REPLICA_CACHE_TTL'] if self.current() is not None else None
+
+    def read_only(self, func):
+        """Run a view's queries on a replica unless the client wrote recently.
+
+        A view failing because its replica went away is run again on the
+        primary; the view must not write.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = None if self.is_sticky() else self.choose()
+            if key is None:
+                return func(*args, **kwargs)
+            session = self.db.session
+            session.info[SESSION_KEY] = key
+            try:
+                return func(*args, **kwargs)
+            except OperationalError:
+                self.mark_failed(key)
+                session.rollback()
+                session.info.pop(SESSION_KEY, None)
+                return func(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,136 @@
+"""Full-text search over task and project text.
+
+The index lives outside the ORM models and is kept in sync by the
+database itself, so every write path (ORM, bulk Core statements,
+imports) updates it:
+
+- SQLite: FTS5 external-content tables ``task_fts`` and ``project_fts``
+  maintained by triggers, ranked with bm25
+- PostgreSQL: a generated ``search_vector`` tsvector column with a GIN
+  index, ranked with ts_rank
+
+Other databases have no search index.
+"""
+import re
+
+from sqlalchemy import text
+
+# Indexed columns of every searchable table
+SEARCH_COLUMNS = {
+    'task': ('title', 'description'),
+    'project': ('name', 'description'),
+}
+
+
+def _sqlite_ddl(table, columns):
+    fts = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def _postgresql_ddl(table, columns):
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)",
+    ]
+
+
+def create_statements(dialect, table):
+    """DDL creating the search index of a table, empty when the dialect has none"""
+    if dialect == 'sqlite':
+        return _sqlite_ddl(table, SEARCH_COLUMNS[table])
+    if dialect == 'postgresql':
+        return _postgresql_ddl(table, SEARCH_COLUMNS[table])
+    return []
+
+
+def drop_statements(dialect, table):
+    """DDL removing the search index of a table"""
+    if dialect == 'sqlite':
+        return [f'DROP TRIGGER IF EXISTS {table}_fts_{event}' for event in ('insert', 'delete', 'update')] + [
+            f'DROP TABLE IF EXISTS {table}_fts'
+        ]
+    if dialect == 'postgresql':
+        return [
+            f'DROP INDEX IF EXISTS ix_{table}_search_vector',
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+        ]
+    return []
+
+
+def rebuild_statements(dialect):
+    """Statements re-indexing every row (generated columns never need it)"""
+    if dialect == 'sqlite':
+        return [f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')" for table in SEARCH_COLUMNS]
+    return []
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Alembic filter hiding the search index from autogenerate"""
+    if type_ == 'table' and reflected and compare_to is None:
+        return not any(name == f'{table}_fts' or name.startswith(f'{table}_fts_') for table in SEARCH_COLUMNS)
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    if type_ == 'index' and name.endswith('_search_vector'):
+        return False
+    return True
+
+
+WORD = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Split a user query into words; punctuation and operators are dropped"""
+    return WORD.findall(query.lower())
+
+
+def match_expression(dialect, words):
+    """Match every word, the last one as a prefix (for search-as-you-type)"""
+    if dialect == 'sqlite':
+        quoted = [f'"{word}"' for word in words]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+    return ' & '.join(words) + ':*'
+
+
+def search_statement(dialect, types):
+    """Ranked union over the searchable tables of the given types.
+
+    Rows are ``(type, id, project_id, title, score)``, best match first;
+    a higher score is a better match on every dialect. Binds ``match``,
+    ``limit`` and ``offset``.
+    """
+    selects = []
+    for table in types:
+        title = SEARCH_COLUMNS[table][0]
+        project_id = 'project_id' if table == 'task' else 'id'
+        if dialect == 'sqlite':
+            selects.append(
+                f"SELECT '{table}' AS type, {table}.id AS id, {table}.{project_id} AS project_id, "
+                f"{table}.{title} AS title, -bm25({table}_fts) AS score "
+                f"FROM {table}_fts JOIN {table} ON {table}.id = {table}_fts.rowid "
+                f"WHERE {table}_fts MATCH :match"
+            )
+        elif dialect == 'postgresql':
+            selects.append(
+                f"SELECT '{table}' AS type, id, {project_id} AS project_id, {title} AS title, "
+                f"ts_rank(search_vector, to_tsquery('simple', :match)) AS score "
+                f"FROM {table} WHERE search_vector @@ to_tsquery('simple', :match)"
+            )
+        else:
+            raise NotImplementedError(f'Full-text search is not available on {dialect}')
+    return text(' UNION ALL '.join(selects) + ' ORDER BY score DESC, type, id LIMIT :limit OFFSET :offset')
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, 'benchmarks'))
+
+from app import Project, Task, create_app, db, project_summary_cache  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite file, without replicas"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'tasks.db'}",
+        'SQLALCHEMY_BINDS': {},
+    })
+    # Keyed on cache generations, which start over with every app
+    project_summary_cache.clear()
+    with app.app_context():
+        # Only the primary: db keeps the binds of every app created before
+        db.create_all(bind_key=None)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def project(app):
+    """A project with tasks A, B and C, C depending on A; returns {name: id}"""
+    with app.app_context():
+        project = Project(name='Website')
+        db.session.add(project)
+        db.session.flush()
+        a = Task(title='A', project_id=project.id)
+        b = Task(title='B', project_id=project.id)
+        c = Task(title='C', project_id=project.id, dependencies=[a])
+        db.session.add_all([a, b, c])
+        db.session.commit()
+        return {'project': project.id, 'A': a.id, 'B': b.id, 'C': c.id}
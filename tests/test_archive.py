@@ -0,0 +1,32 @@
+"""Archiving of completed tasks"""
+from datetime import datetime, timedelta
+
+from app import ArchivedTask, Project, Task, archive_completed_tasks, db
+
+
+def test_archived_ids_are_not_reused(app, client):
+    with app.app_context():
+        project = Project(name='Website')
+        db.session.add(project)
+        db.session.flush()
+        tasks = [Task(title=f'Task {number}', project_id=project.id) for number in range(1, 11)]
+        db.session.add_all(tasks)
+        db.session.commit()
+        ids = [task.id for task in tasks]
+        tasks[4].status = 'Done'
+        tasks[4].completed_at = datetime.utcnow() - timedelta(days=60)
+        db.session.commit()
+        assert archive_completed_tasks(30, 100) == 1
+        project_id = project.id
+    for task_id in ids[5:]:
+        etag = client.get(f'/tasks/{task_id}').headers['ETag']
+        assert client.delete(f'/tasks/{task_id}', headers={'If-Match': etag}).status_code == 204
+
+    response = client.post(f'/projects/{project_id}/tasks', json={'title': 'New', 'project_id': project_id})
+    assert response.status_code == 201
+    assert response.get_json()['id'] > max(ids)
+
+    listed = [task['id'] for task in client.get(f'/projects/{project_id}/tasks?include_archived=true').get_json()]
+    assert len(listed) == len(set(listed)) == 6
+    with app.app_context():
+        assert db.session.get(ArchivedTask, ids[4]) is not None
@@ -0,0 +1,35 @@
+"""Caches shared, or not, between worker processes"""
+import logging
+import time
+
+from sqlalchemy import insert
+
+import cache
+from app import Task, create_app, db, project_summaries
+
+
+def test_summaries_expire(app, project, monkeypatch):
+    with app.test_request_context():
+        assert project_summaries([project['project']])[project['project']]['total'] == 3
+        # Written by another worker, whose invalidation this one never sees
+        db.session.execute(insert(Task).values(title='D', project_id=project['project'], version=1))
+        db.session.commit()
+        assert project_summaries([project['project']])[project['project']]['total'] == 3
+
+        later = time.monotonic() + app.config['RESPONSE_CACHE_TTL'] + 1
+        monkeypatch.setattr(cache.time, 'monotonic', lambda: later)
+        assert project_summaries([project['project']])[project['project']]['total'] == 4
+
+
+def test_warns_about_workers_without_shared_cache(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'tasks.db'}", 'SQLALCHEMY_BINDS': {}}
+    with caplog.at_level(logging.WARNING):
+        create_app(config)
+    assert '4 worker processes without RESPONSE_CACHE_URL or EVENT_BROKER_URL' in caplog.text
+
+    caplog.clear()
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    with caplog.at_level(logging.WARNING):
+        create_app(config)
+    assert 'worker processes' not in caplog.text
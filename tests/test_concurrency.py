@@ -0,0 +1,83 @@
+"""Writes that lose the race against a concurrent one"""
+import pytest
+from sqlalchemy import update
+
+import app as application
+from app import Task, db
+
+
+@pytest.fixture
+def race(app, monkeypatch):
+    """Have a concurrent request change a task just before the view calls the named function"""
+    def arrange(name, task_id):
+        original = getattr(application, name)
+
+        def racing(*args, **kwargs):
+            table = Task.__table__
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(table).where(table.c.id == task_id).values(version=table.c.version + 1)
+                )
+            monkeypatch.setattr(application, name, original)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(application, name, racing)
+    return arrange
+
+
+def current_etag(client, task_id):
+    return client.get(f'/tasks/{task_id}').headers['ETag']
+
+
+def task_state(app, task_id):
+    """(status, dependency ids) of a task as stored"""
+    with app.app_context():
+        task = db.session.get(Task, task_id)
+        return task.status, [dependency.id for dependency in task.dependencies]
+
+
+def flashed(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
+
+
+def test_put_status_conflict(app, client, project, race):
+    etag = current_etag(client, project['A'])
+    race('refresh_open_dependency_counts', project['A'])
+    response = client.put(f"/tasks/{project['A']}", headers={'If-Match': etag}, json={
+        'title': 'A', 'status': 'Done', 'project_id': project['project'],
+    })
+    assert response.status_code == 409
+    assert task_state(app, project['A'])[0] != 'Done'
+
+
+def test_put_dependencies_conflict(app, client, project, race):
+    etag = current_etag(client, project['B'])
+    race('set_dependencies', project['B'])
+    response = client.put(f"/tasks/{project['B']}", headers={'If-Match': etag}, json={
+        'title': 'B', 'project_id': project['project'], 'dependencies': [project['A']],
+    })
+    assert response.status_code == 409
+    assert task_state(app, project['B'])[1] == []
+
+
+def test_edit_task_conflict(app, client, project, race):
+    version = client.get(f"/tasks/{project['A']}").get_json()['version']
+    race('refresh_open_dependency_counts', project['A'])
+    response = client.post(f"/edit_task/{project['A']}", data={
+        'title': 'A', 'description': '', 'status': 'Done', 'due_date': '', 'version': version,
+    })
+    assert response.status_code == 302
+    assert 'was changed by someone else' in flashed(client)[0]
+    assert task_state(app, project['A'])[0] != 'Done'
+
+
+def test_complete_task_conflict(app, client, project, race):
+    race('refresh_open_dependency_counts', project['A'])
+    response = client.post(f"/complete_task/{project['A']}")
+    assert response.status_code == 302
+    assert 'was changed by someone else' in flashed(client)[0]
+    assert task_state(app, project['A'])[0] != 'Done'
+    # The next attempt goes through
+    client.post(f"/complete_task/{project['A']}")
+    assert task_state(app, project['A'])[0] == 'Done'
@@ -0,0 +1,51 @@
+"""Dependency cycle checks"""
+from app import Project, Task, db
+
+
+def test_cycle_through_another_project(app, client):
+    with app.app_context():
+        projects = [Project(name=name) for name in ('P1', 'P2', 'P3')]
+        db.session.add_all(projects)
+        db.session.flush()
+        a = Task(title='A', project_id=projects[0].id)
+        b = Task(title='B', project_id=projects[1].id)
+        c = Task(title='C', project_id=projects[2].id, dependencies=[a])
+        b.dependencies = [c]
+        db.session.add_all([a, b, c])
+        db.session.commit()
+        ids = {'A': a.id, 'B': b.id, 'C': c.id, 'P1': projects[0].id}
+
+    etag = client.get(f"/tasks/{ids['A']}").headers['ETag']
+    response = client.put(f"/tasks/{ids['A']}", headers={'If-Match': etag}, json={
+        'title': 'A', 'project_id': ids['P1'], 'dependencies': [ids['B']],
+    })
+    assert response.status_code == 409
+    assert response.get_json()['message'] == f"Dependency cycle: {ids['A']} -> {ids['B']} -> {ids['C']} -> {ids['A']}"
+
+
+def test_relinking_breaks_stored_path(app, client, project):
+    # C depends on A; giving C other dependencies lets A depend on C
+    response = client.patch('/tasks:batch', json={'tasks': [
+        {'id': project['C'], 'dependencies': [project['B']]},
+        {'id': project['A'], 'dependencies': [project['C']]},
+    ]})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == [200, 200]
+
+
+def test_blockers_in_other_projects(app, client):
+    with app.app_context():
+        projects = [Project(name=name) for name in ('P1', 'P2')]
+        db.session.add_all(projects)
+        db.session.flush()
+        c = Task(title='C', project_id=projects[0].id)
+        done = Task(title='Done', project_id=projects[1].id, status='Done', dependencies=[c])
+        b = Task(title='B', project_id=projects[1].id, dependencies=[c])
+        a = Task(title='A', project_id=projects[0].id, dependencies=[b, done])
+        db.session.add_all([a, b, c, done])
+        db.session.commit()
+        ids = {'A': a.id, 'B': b.id, 'C': c.id}
+
+    response = client.get(f"/tasks/{ids['A']}/blockers")
+    assert response.status_code == 200
+    assert sorted(response.get_json()['blockers']) == sorted([ids['B'], ids['C']])
@@ -0,0 +1,21 @@
+"""Database engine setup"""
+from sqlalchemy import create_engine, text
+
+from app import db
+
+
+def test_sqlite_pragmas(app):
+    app.config['SQLITE_BUSY_TIMEOUT'] = 1  # Read when the app was created, not per connection
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+            assert connection.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+
+
+def test_other_engines_outside_app_context(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    with engine.connect() as connection:
+        assert connection.execute(text('SELECT 1')).scalar() == 1
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'delete'
+    engine.dispose()
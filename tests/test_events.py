@@ -0,0 +1,27 @@
+"""Project event streams"""
+from sqlalchemy import insert
+
+from app import TaskEvent, db, event_broker, project_event_stream
+
+
+def test_stream_sends_events_published_out_of_order(app, project):
+    app.config.update(EVENT_HEARTBEAT=0.05, EVENT_STREAM_TIMEOUT=1)
+    with app.test_request_context():
+        stream = project_event_stream(project['project'])
+        assert next(stream) == ': keep-alive\n\n'
+
+        # Two transactions commit their events in order, but the later
+        # one publishes first and the other one's message is still on its way
+        with db.engine.begin() as connection:
+            first, second = connection.execute(
+                insert(TaskEvent).returning(TaskEvent.id, sort_by_parameter_order=True),
+                [{'project_id': project['project'], 'task_id': task_id, 'type': 'updated', 'data': '{}'}
+                 for task_id in (project['A'], project['B'])],
+            ).scalars().all()
+        event_broker.publish(f"project:{project['project']}", {'id': second, 'type': 'updated', 'data': '{}'})
+
+        assert next(stream) == f'id: {first}\nevent: updated\ndata: {{}}\n\n'
+        assert next(stream) == f'id: {second}\nevent: updated\ndata: {{}}\n\n'
+        event_broker.publish(f"project:{project['project']}", {'id': first, 'type': 'updated', 'data': '{}'})
+        assert next(stream) == ': keep-alive\n\n'
+        stream.close()
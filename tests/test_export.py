@@ -0,0 +1,15 @@
+"""Dataset export"""
+from sqlalchemy import insert
+
+from app import Task, db, export_records
+
+
+def test_export_is_one_snapshot(app, project):
+    with app.app_context():
+        records = export_records(chunk_size=1)
+        assert next(records)['type'] == 'project'
+        # Written while the export is under way
+        with db.engine.begin() as connection:
+            connection.execute(insert(Task).values(title='D', project_id=project['project'], version=1))
+        tasks = [record['title'] for record in records if record['type'] == 'task']
+    assert sorted(tasks) == ['A', 'B', 'C']
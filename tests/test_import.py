@@ -0,0 +1,37 @@
+"""Dataset import"""
+import json
+
+from app import Project, db
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def test_cycle_across_project_chunks(app, client):
+    app.config['API_STREAM_CHUNK_SIZE'] = 1
+    body = ndjson(
+        {'type': 'project', 'id': 1, 'name': 'P1'},
+        {'type': 'project', 'id': 2, 'name': 'P2'},
+        {'type': 'task', 'id': 1, 'project_id': 1, 'title': 'A'},
+        {'type': 'task', 'id': 2, 'project_id': 2, 'title': 'B'},
+        {'type': 'dependency', 'task_id': 1, 'dependency_id': 2},
+        {'type': 'dependency', 'task_id': 2, 'dependency_id': 1},
+    )
+    response = client.post('/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 409
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Project.id))) == 0
+
+
+def test_acyclic_import(app, client):
+    app.config['API_STREAM_CHUNK_SIZE'] = 1
+    body = ndjson(
+        {'type': 'project', 'id': 1, 'name': 'P1', 'description': None},
+        {'type': 'task', 'id': 1, 'project_id': 1, 'title': 'A', 'due_date': None},
+        {'type': 'task', 'id': 2, 'project_id': 1, 'title': 'B'},
+        {'type': 'dependency', 'task_id': 2, 'dependency_id': 1},
+    )
+    response = client.post('/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert response.get_json() == {'projects': 1, 'tasks': 2, 'dependencies': 1}
@@ -0,0 +1,42 @@
+"""Background jobs"""
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import app as application
+from app import Job, db, job_queue
+
+
+@pytest.fixture
+def import_job(app, tmp_path):
+    """A queued import job with its spooled body; returns (job id, spool path)"""
+    app.config.update(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=0)
+    spool = tmp_path / 'import.ndjson'
+    spool.write_text('{"type": "project", "id": 1, "name": "P1"}\n')
+    with app.app_context():
+        # Not enqueued, so that the test runs it rather than the pool
+        job = Job(name='import', payload={'path': str(spool), 'format': 'ndjson'})
+        db.session.add(job)
+        db.session.commit()
+        return job.id, spool
+
+
+def test_spool_removed_after_success(app, import_job):
+    job_id, spool = import_job
+    with app.app_context():
+        job_queue.run(job_id)
+        assert db.session.get(Job, job_id).status == 'succeeded'
+    assert not spool.exists()
+
+
+def test_spool_removed_once_retries_run_out(app, import_job, monkeypatch):
+    job_id, spool = import_job
+
+    def unavailable(lines, format):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(application, 'import_dataset', unavailable)
+    with app.app_context():
+        job_queue.run(job_id)
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('failed', 2)
+    assert not spool.exists()
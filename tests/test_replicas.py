@@ -0,0 +1,98 @@
+"""Routing of read-only views to a SQLite copy of the primary"""
+import pytest
+from sqlalchemy import update
+
+from app import Project, Task, create_app, db, project_summary_cache
+from replicas import copy_sqlite_database
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app whose replica is a copy of the primary holding task 'Draft'"""
+    primary, replica = tmp_path / 'tasks.db', tmp_path / 'replica.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_BINDS': {'replica': f'sqlite:///{replica}'},
+    })
+    project_summary_cache.clear()
+    with app.app_context():
+        db.create_all(bind_key=None)
+        project = Project(name='Website')
+        db.session.add(project)
+        db.session.flush()
+        task = Task(title='Draft', project_id=project.id)
+        db.session.add(task)
+        db.session.commit()
+        app.config['TEST_IDS'] = {'project': project.id, 'task': task.id}
+        db.engine.dispose()
+    copy_sqlite_database(str(primary), str(replica))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def change_on_primary(app, title):
+    """Change the task on the primary only, as if the replica lagged behind"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(Task).where(Task.id == app.config['TEST_IDS']['task'])
+                .values(title=title, version=Task.version + 1)
+            )
+
+
+def test_reads_go_to_the_replica(app):
+    change_on_primary(app, 'Final')
+    task_id = app.config['TEST_IDS']['task']
+    assert app.test_client().get(f'/tasks/{task_id}').get_json()['title'] == 'Draft'
+
+
+def test_writer_reads_its_own_writes(app):
+    ids = app.config['TEST_IDS']
+    writer, reader = app.test_client(), app.test_client()
+    etag = writer.get(f"/tasks/{ids['task']}").headers['ETag']
+    response = writer.put(f"/tasks/{ids['task']}", headers={'If-Match': etag}, json={
+        'title': 'Final', 'project_id': ids['project'],
+    })
+    assert response.status_code == 200
+    assert 'read_primary_until' in response.headers['Set-Cookie']
+
+    # The replica hasn't caught up; another client reads and caches its copy
+    assert reader.get(f"/tasks/{ids['task']}").get_json()['title'] == 'Draft'
+
+    response = writer.get(f"/tasks/{ids['task']}")
+    assert response.get_json()['title'] == 'Final'
+    response = writer.put(f"/tasks/{ids['task']}", headers={'If-Match': response.headers['ETag']}, json={
+        'title': 'Published', 'project_id': ids['project'],
+    })
+    assert response.status_code == 200
+
+
+def test_failed_replica_falls_back_to_the_primary(app, tmp_path):
+    change_on_primary(app, 'Final')
+    # The replica lost its tables
+    (tmp_path / 'replica.db').unlink()
+    task_id = app.config['TEST_IDS']['task']
+    client = app.test_client()
+    assert client.get(f'/tasks/{task_id}').get_json()['title'] == 'Final'
+    assert client.get(f'/projects/{app.config["TEST_IDS"]["project"]}/tasks').get_json()[0]['title'] == 'Final'
+    assert not app.extensions['replica_router'].health['replica'][0]
+
+
+def test_writer_gets_summaries_from_the_primary(app):
+    ids = app.config['TEST_IDS']
+    writer, reader = app.test_client(), app.test_client()
+    etag = writer.get(f"/tasks/{ids['task']}").headers['ETag']
+    response = writer.put(f"/tasks/{ids['task']}", headers={'If-Match': etag}, json={
+        'title': 'Draft', 'status': 'Done', 'project_id': ids['project'],
+    })
+    assert response.status_code == 200
+
+    def percent_complete(client):
+        return client.get('/projects?include=summary').get_json()[0]['summary']['percent_complete']
+
+    assert percent_complete(reader) == 0.0
+    assert percent_complete(writer) == 100.0
@@ -0,0 +1,54 @@
+"""SQL statements per page, which must not grow with the number of rows.
+
+The dashboard runs 3 statements with cold project summaries (projects,
+task counts, archived task counts) and 1 once they are cached, whatever
+the number of projects and tasks. The project page runs 2 statements
+plus one per 500 tasks, selectinload's batch size for the dependencies:
+3 up to 500 tasks, 5 at 1200.
+"""
+import pytest
+from sqlalchemy import event
+
+from app import Project, db
+from datagen import generate
+
+
+@pytest.fixture
+def statements(app):
+    """Counter of the statements sent to any engine since its last reset"""
+    counter = {'count': 0}
+
+    def count(*args):
+        counter['count'] += 1
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', count)
+    return counter
+
+
+def seed(app, tasks):
+    """Three projects of tasks per project; return the id of the first"""
+    with app.app_context():
+        generate(projects=3, tasks=tasks, dependency_density=1.0, templates=1, template_tasks=5, seed=0)
+        return db.session.scalars(db.select(Project.id).order_by(Project.id)).first()
+
+
+def statements_for(client, statements, url):
+    statements['count'] = 0
+    assert client.get(url).status_code == 200
+    return statements['count']
+
+
+@pytest.mark.parametrize('tasks', [10, 1200])
+def test_index(app, client, statements, tasks):
+    seed(app, tasks)
+    assert statements_for(client, statements, '/') == 3
+    assert statements_for(client, statements, '/') == 1
+
+
+@pytest.mark.parametrize('tasks, expected', [(10, 3), (500, 3), (501, 4), (1200, 5)])
+def test_project_detail(app, client, statements, tasks, expected):
+    project_id = seed(app, tasks)
+    assert statements_for(client, statements, f'/project_detail/{project_id}') == expected
+    assert statements_for(client, statements, f'/project_detail/{project_id}?status=To+Do') <= expected